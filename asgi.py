@@ -0,0 +1,148 @@
+# Async serving mode for the recommendation endpoints:
+#     uvicorn asgi:app --workers 4
+# Validation, genre normalization, JWT handling, caching and history
+# writes are shared with the Flask blueprints in routes/recommend.py.
+import time
+import httpx
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from utils.auth import get_user_id_from_header, token_cache, AuthError
+from utils.cache import recommendation_cache
+from utils.resilience import CircuitOpenError, get_upstream_guard_stats
+from utils.history_writer import history_writer
+from utils.fallback_index import fallback_index
+from utils.rate_limit import limit_request, rate_limiter
+from utils.metrics import metrics, request_latency, internal_request_allowed, CONTENT_TYPE
+from utils.recommender import (
+    parse_recommend_payload, parse_response_options, recommendation_response,
+    RecommendRequestError, UpstreamError
+)
+from utils.async_recommender import (
+    fetch_recommendations_async, save_recommendation_history_async,
+    close_async_upstream_clients, async_upstream_flight, off_loop
+)
+
+async def recommend(request):
+    client = request.client.host if request.client else None
+    retry_after = await off_loop(
+        rate_limiter.store.blocking or token_cache.blocking,
+        limit_request, "recommend", request.headers.get('Authorization'), request.headers, client
+    )
+    if retry_after is not None:
+        return JSONResponse({"error": "Rate limit exceeded", "retry_after": retry_after},
+                            status_code=429, headers={"Retry-After": str(retry_after)})
+
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+
+        try:
+            rec_type, genres_list, top_k = parse_recommend_payload(data)
+            description_max, columnar = parse_response_options(data)
+        except RecommendRequestError as e:
+            return JSONResponse({"error": e.message}, status_code=e.status_code)
+
+        # JWT Authentication
+        try:
+            user_id = await off_loop(
+                token_cache.blocking, get_user_id_from_header, request.headers.get('Authorization')
+            )
+        except AuthError as e:
+            return JSONResponse({"error": str(e)}, status_code=401)
+
+        # Call microservice (or serve from cache)
+        try:
+            normalized, source = await fetch_recommendations_async(rec_type, genres_list, top_k)
+
+            await save_recommendation_history_async(user_id, rec_type, genres_list, normalized, {"top_k": top_k})
+
+            return JSONResponse(recommendation_response(
+                rec_type, genres_list, normalized, source, description_max, columnar
+            ))
+
+        except UpstreamError as e:
+            return JSONResponse(e.payload, status_code=e.status_code)
+        except CircuitOpenError as e:
+            return JSONResponse({"error": f"Failed to connect to {rec_type} service", "details": str(e)}, status_code=503)
+        except httpx.TimeoutException:
+            return JSONResponse({"error": f"{rec_type} service timeout"}, status_code=504)
+        except httpx.HTTPError as e:
+            return JSONResponse({"error": f"Failed to connect to {rec_type} service", "details": str(e)}, status_code=503)
+
+    except Exception as e:
+        print(f"Recommend error: {e}")
+        return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+def _internal(request):
+    client = request.client.host if request.client else None
+    return internal_request_allowed(request.headers.get("authorization"), client)
+
+async def recommend_stats(request):
+    if not _internal(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return JSONResponse({
+        "status": "success",
+        "cache": recommendation_cache.info(),
+        "single_flight": async_upstream_flight.stats(),
+        "upstream": get_upstream_guard_stats(),
+        "fallback_index": fallback_index.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "history_writer": history_writer.stats()
+    })
+
+async def health_check(request):
+    return JSONResponse({"status": "healthy", "message": "ASGI backend is running"})
+
+async def metrics_endpoint(request):
+    if not _internal(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return Response(metrics.render(), headers={"Content-Type": CONTENT_TYPE})
+
+routes = [
+    Route('/recommend/tvshowrec', recommend, methods=['POST']),
+    Route('/recommend/movies', recommend, methods=['POST']),
+    Route('/recommend/book', recommend, methods=['POST']),
+    Route('/recommend/stats', recommend_stats, methods=['GET']),
+    Route('/health', health_check, methods=['GET']),
+    Route('/metrics', metrics_endpoint, methods=['GET'])
+]
+ROUTE_PATHS = {route.path for route in routes}
+
+# Request latency for /metrics, measured around the whole ASGI call;
+# unknown paths share one label to keep the number of series bounded
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope["path"] if scope["path"] in ROUTE_PATHS else "unmatched"
+            request_latency.observe(time.perf_counter() - start, scope["method"], route, status[0])
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(RequestMetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    ],
+    on_shutdown=[close_async_upstream_clients, history_writer.shutdown]
+)
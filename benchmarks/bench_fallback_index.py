@@ -0,0 +1,67 @@
+# Build time, refresh (update) time and lookup latency of the local fallback
+# genre index (utils.fallback_index.GenreIndex) over a synthetic catalog.
+#
+#     python benchmarks/bench_fallback_index.py --items 50000 --genres 40
+import argparse
+import os
+import random
+import sys
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.cache import normalize_genres
+from utils.fallback_index import GenreIndex
+
+def make_catalog(count, genre_count, seed=7):
+    rng = random.Random(seed)
+    genres = [f"genre{i}" for i in range(genre_count)]
+    return {
+        f"Item {i}": {
+            "type": "movie",
+            "name": f"Item {i}",
+            "genre": rng.sample(genres, rng.randint(1, 3)),
+            "rating": round(rng.uniform(1, 10), 1)
+        }
+        for i in range(count)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Fallback genre index benchmark")
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--genres", type=int, default=40)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--changed", type=int, default=500, help="items changed per refresh")
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.items, args.genres)
+    start = time.perf_counter()
+    index = GenreIndex(catalog)
+    print(f"{args.items} items, {args.genres} genres: built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # A refresh re-rates some items, adds new ones and evicts as many
+    rng = random.Random(11)
+    upserts = {}
+    for name in rng.sample(sorted(catalog), args.changed // 2):
+        upserts[name] = dict(catalog[name], rating=round(rng.uniform(1, 10), 1))
+    fresh = make_catalog(args.items + args.changed - len(upserts), args.genres, seed=13)
+    for i in range(args.items, args.items + args.changed - len(upserts)):
+        upserts[f"Item {i}"] = fresh[f"Item {i}"]
+    removed = [f"Item {i}" for i in range(args.changed - args.changed // 2)]
+    start = time.perf_counter()
+    index.updated(upserts, removed)
+    print(f"{args.changed} changed items: updated in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # cold: intersection and merge on every call; memoized: repeated query
+    print(f"{'genres per query':<18}{'cold us':>10}{'memoized us':>14}")
+    for per_query in (1, 2, 3):
+        query = normalize_genres([f"genre{i}" for i in range(per_query)])
+        cold = timeit.timeit(lambda: index._query(query, args.top_k), number=args.queries)
+        memoized = timeit.timeit(lambda: index.query(query, args.top_k), number=args.queries)
+        print(f"{per_query:<18}{cold / args.queries * 1e6:>10.2f}{memoized / args.queries * 1e6:>14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Page latency of GET /history's data access at increasing depths: legacy
+# skip/limit versus keyset cursors, over one user with a long history.
+#
+#     python benchmarks/bench_history_pagination.py --entries 100000
+#
+# Uses MONGO_URI from the environment or .env and writes to a separate
+# database (default recommendation_bench) that is dropped afterwards.
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def seed(db, user_id, entries):
+    from bson import ObjectId
+
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    batch = []
+    for i in range(entries):
+        batch.append({
+            "user_id": user_id,
+            "recommendation_type": "movie",
+            "genre": ["Action"],
+            "items": [{"type": "movie", "name": f"Movie {i}", "rating": 7.5}],
+            "query_params": {"top_k": 10},
+            # Several rows share a timestamp to exercise the _id tiebreaker
+            "timestamp": base + timedelta(milliseconds=i // 3)
+        })
+        if len(batch) == 10000:
+            db.history.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.history.insert_many(batch, ordered=False)
+
+def time_page(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description="History pagination benchmark")
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database", default="recommendation_bench")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark database")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_NAME"] = args.database
+    from bson import ObjectId
+    from config.database import init_db
+    from models.history import History
+
+    db = init_db()
+    user_id = ObjectId()
+    print(f"Seeding {args.entries} history entries...")
+    seed(db, user_id, args.entries)
+
+    depths = sorted({d for d in (0, 100, 1000, 10000, 50000, args.entries - 100) if 0 <= d < args.entries})
+
+    # Walk the cursor chain once, remembering the cursor at each depth
+    cursors = {0: None}
+    cursor = None
+    position = 0
+    while position < depths[-1]:
+        _, cursor = History.get_user_history_page(user_id, limit=100, cursor=cursor)
+        position += 100
+        for depth in depths:
+            if depth == position:
+                cursors[depth] = cursor
+
+    print(f"\n{'depth':>8}{'offset ms':>12}{'cursor ms':>12}")
+    for depth in depths:
+        offset_ms = time_page(lambda: History.get_user_history_page(user_id, limit=args.limit, offset=depth), args.repeat)
+        if depth in cursors:
+            cursor_ms = time_page(lambda: History.get_user_history_page(user_id, limit=args.limit, cursor=cursors[depth]), args.repeat)
+            print(f"{depth:>8}{offset_ms:>12.2f}{cursor_ms:>12.2f}")
+        else:
+            print(f"{depth:>8}{offset_ms:>12.2f}{'-':>12}")
+
+    if not args.keep:
+        db.client.drop_database(args.database)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Cost of rendering a 100-row GET /history page: the previous path (str()
+# every ObjectId, then flask.jsonify) versus utils.serializer.dumps, which
+# writes BSON rows straight to JSON bytes.
+#
+#     python benchmarks/bench_history_serialization.py --rows 100
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bson import ObjectId
+from flask import Flask, jsonify
+from utils import serializer
+
+def make_rows(count, items_per_row=10):
+    user_id = ObjectId()
+    base = datetime(2024, 1, 1)
+    return [{
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "recommendation_type": "movie",
+        "genre": ["Action", "Comedy"],
+        "items": [{
+            "type": "movie",
+            "name": f"Movie {i}-{j}",
+            "creator": "Some Director",
+            "description": "A fairly typical description of a film. " * 3,
+            "genre": ["Action", "Comedy"],
+            "rating": 7.5
+        } for j in range(items_per_row)],
+        "query_params": {"top_k": items_per_row},
+        "timestamp": base + timedelta(minutes=i)
+    } for i in range(count)]
+
+def legacy_render(app, rows):
+    with app.app_context():
+        page = [dict(row) for row in rows]
+        for item in page:
+            item["_id"] = str(item["_id"])
+            item["user_id"] = str(item["user_id"])
+        return jsonify({"status": "success", "history": page, "count": len(page)}).get_data()
+
+def serializer_render(rows):
+    return serializer.dumps({"status": "success", "history": rows, "count": len(rows)})
+
+def measure(label, fn, rows, iterations):
+    fn()  # warm up
+    seconds = timeit.timeit(fn, number=iterations)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    us_per_row = seconds / iterations / rows * 1e6
+    print(f"{label:<22}{us_per_row:>12.2f}{peak / 1024:>14.1f}{len(fn()):>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description="History page serialization benchmark")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    rows = make_rows(args.rows)
+
+    print(f"{args.rows} rows, serializer backend: {serializer.JSON_BACKEND}")
+    print(f"{'path':<22}{'us/row':>12}{'peak KiB':>14}{'bytes':>12}")
+    measure("str() + jsonify", lambda: legacy_render(app, rows), args.rows, args.iterations)
+    measure("serializer.dumps", lambda: serializer_render(rows), args.rows, args.iterations)
+
+if __name__ == "__main__":
+    main()
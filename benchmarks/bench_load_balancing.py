@@ -0,0 +1,116 @@
+# Client-side load balancing harness: starts several stub movie
+# recommenders with different latencies (optionally one that always fails)
+# and drives UpstreamClient directly with each balancing strategy, printing
+# how traffic was spread and the resulting latency.
+#
+#     python benchmarks/bench_load_balancing.py --delays 0.01,0.05,0.2 --failing
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_recommender import start_stub
+from load import percentile
+
+class FailingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"status": "error", "message": "unavailable"}).encode()
+        self.send_response(503)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_failing(port):
+    server = ThreadingHTTPServer(("127.0.0.1", port), FailingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def drive(client, concurrency, requests_per_worker):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        local_errors = 0
+        for _ in range(requests_per_worker):
+            start = time.perf_counter()
+            try:
+                response = client.post(json={"genres": ["Action"], "top_k": 5})
+                if response.status_code != 200:
+                    local_errors += 1
+            except Exception:
+                local_errors += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return latencies, errors[0], elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Replica load balancing harness")
+    parser.add_argument("--delays", default="0.01,0.05,0.2", help="comma-separated stub latencies (s)")
+    parser.add_argument("--failing", action="store_true", help="add a replica that always returns 503")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50, help="requests per worker")
+    parser.add_argument("--base-port", type=int, default=9201)
+    args = parser.parse_args()
+
+    delays = [float(d) for d in args.delays.split(",")]
+    urls = []
+    for i, delay in enumerate(delays):
+        start_stub(args.base_port + i, "movie", delay)
+        urls.append(f"http://127.0.0.1:{args.base_port + i}/")
+    if args.failing:
+        port = args.base_port + len(delays)
+        start_failing(port)
+        urls.append(f"http://127.0.0.1:{port}/")
+
+    # The breaker would hide the failing replica's effect; keep it closed
+    os.environ["BREAKER_FAILURE_THRESHOLD"] = str(10 ** 9)
+    from utils.http_client import UpstreamClient
+    from utils.load_balancer import ReplicaPool
+
+    labels = {url: f"{int(delay * 1000)}ms" for url, delay in zip(urls, delays)}
+    if args.failing:
+        labels[urls[-1]] = "failing"
+
+    for strategy in ("random", "least_outstanding", "p2c"):
+        pool = ReplicaPool(urls, strategy=strategy, eject_duration=5)
+        client = UpstreamClient("movie", pool)
+        latencies, errors, elapsed = drive(client, args.concurrency, args.requests)
+
+        print(f"\n{strategy}: {len(latencies) / elapsed:.1f} req/s, "
+              f"p50 {percentile(latencies, 50) * 1000:.1f}ms, p99 {percentile(latencies, 99) * 1000:.1f}ms, "
+              f"errors {errors}")
+        for replica in pool.stats()["replicas"]:
+            share = replica["requests"] / max(len(latencies), 1) * 100
+            print(f"  {labels[replica['url']]:>8}: {replica['requests']:>5} requests ({share:5.1f}%), "
+                  f"failures {replica['failures']}, ejections {replica['ejections']}")
+        client.close()
+
+if __name__ == "__main__":
+    main()
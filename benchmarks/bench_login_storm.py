@@ -0,0 +1,98 @@
+# Login throughput and POST /recommend/movies latency while a login storm
+# hits the same server: hashing inline on the request threads
+# (PASSWORD_HASH_WORKERS=0) versus the bounded password worker pool.
+#
+#     python benchmarks/bench_login_storm.py --login-concurrency 64 --recommend-concurrency 16
+#
+# Needs MONGO_URI/SECRET_KEY in the environment or .env and gunicorn on
+# PATH. A benchmark user is created through /signup on first run.
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import threading
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_recommender import start_stub
+from load import run_load, wait_for
+
+BENCH_USER = {"username": "loginstorm", "email": "loginstorm@example.com", "password": "benchmark-password"}
+
+def run_mode(label, env, args, port, headers):
+    proc = subprocess.Popen(shlex.split(args.server_cmd.format(port=port)), cwd=ROOT, env=env)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        if not wait_for(f"{base}/health"):
+            print(f"{label}: server did not start")
+            return None
+
+        requests.post(f"{base}/signup", json=BENCH_USER, timeout=30)
+        credentials = {"email": BENCH_USER["email"], "password": BENCH_USER["password"]}
+
+        def recommend_payload(worker_id, i):
+            return {"type": "movie", "genre": f"genre-{worker_id}-{i}", "top_k": 10}
+
+        quiet = run_load(f"{base}/recommend/movies", recommend_payload, headers,
+                         args.recommend_concurrency, args.duration)
+
+        results = {}
+        storm = threading.Thread(target=lambda: results.update(login=run_load(
+            f"{base}/login", lambda w, i: credentials, None, args.login_concurrency, args.duration
+        )))
+        storm.start()
+        results["recommend"] = run_load(f"{base}/recommend/movies", recommend_payload, headers,
+                                        args.recommend_concurrency, args.duration)
+        storm.join()
+        return quiet, results["login"], results["recommend"]
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Login storm benchmark")
+    parser.add_argument("--login-concurrency", type=int, default=64)
+    parser.add_argument("--recommend-concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--delay", type=float, default=0.05, help="stub recommender latency (s)")
+    parser.add_argument("--hash-workers", type=int, default=2)
+    parser.add_argument("--stub-port", type=int, default=9201)
+    parser.add_argument("--port", type=int, default=9202)
+    parser.add_argument("--server-cmd", default="gunicorn --workers 1 --threads 32 --bind 127.0.0.1:{port} main:app")
+    args = parser.parse_args()
+
+    start_stub(args.stub_port, "movie", args.delay)
+
+    env = dict(os.environ)
+    env["MOVIE_RECOMMENDER_URL"] = f"http://127.0.0.1:{args.stub_port}/"
+    env["RECOMMEND_CACHE_BACKEND"] = "none"
+    # One benchmark user/IP would otherwise be throttled
+    env["RATE_LIMIT_ENABLED"] = "false"
+    env.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ["SECRET_KEY"] = env["SECRET_KEY"]
+
+    from utils.jwt_helper import generate_jwt
+    token = generate_jwt("000000000000000000000001", "bench", "bench@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    rows = []
+    for label, workers in (("inline", 0), (f"pool x{args.hash_workers}", args.hash_workers)):
+        mode_env = dict(env, PASSWORD_HASH_WORKERS=str(workers))
+        result = run_mode(label, mode_env, args, args.port, headers)
+        if result is not None:
+            rows.append((label, *result))
+
+    print(f"\nlogin concurrency {args.login_concurrency}, recommend concurrency {args.recommend_concurrency}, "
+          f"{args.duration:.0f}s per phase")
+    print(f"{'hashing':<12}{'login/s':>10}{'login err':>11}{'rec p99 quiet':>15}{'rec p99 storm':>15}{'rec/s storm':>13}")
+    for label, quiet, login, recommend in rows:
+        print(f"{label:<12}{login['rps']:>10}{login['errors']:>11}{quiet['p99_ms']:>15}"
+              f"{recommend['p99_ms']:>15}{recommend['rps']:>13}")
+
+if __name__ == "__main__":
+    main()
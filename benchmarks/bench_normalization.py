@@ -0,0 +1,89 @@
+# CPU cost of turning a large upstream result into a response body: the
+# previous per-item normalization loop plus flask.jsonify, versus the
+# compiled per-type normalizer with full, truncated or omitted
+# descriptions, as rows or columns, rendered with utils.serializer.
+#
+#     python benchmarks/bench_normalization.py --items 1000 --description-size 2000
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask, jsonify
+from utils import serializer
+from utils.recommender import RECOMMENDER_TYPES, recommendation_response
+
+def make_raw_items(count, description_size):
+    description = ("A long upstream synopsis. " * (description_size // 26 + 1))[:description_size]
+    return [{
+        "title": f"Movie {i}",
+        "director": "Some Director",
+        "description": description,
+        "genre": ["Action", "Comedy"],
+        "rating": 7.5,
+        "score": 0.93,
+        "embedding_id": i
+    } for i in range(count)]
+
+def legacy_normalize(rec_type, raw_items, extra_fields=()):
+    normalized = []
+    for item in raw_items:
+        entry = {
+            "type": rec_type,
+            "name": item.get("name") or item.get("title"),
+            "creator": item.get("director") or item.get("author") or item.get("creator"),
+            "description": item.get("description", ""),
+            "genre": item.get("genre", []),
+            "rating": item.get("rating")
+        }
+        for field in extra_fields:
+            entry[field] = item.get(field)
+        normalized.append(entry)
+    return normalized
+
+def legacy_render(app, raw_items):
+    with app.app_context():
+        items = legacy_normalize("movie", raw_items)
+        return jsonify({"status": "success", "recommendations": items, "count": len(items)}).get_data()
+
+def compiled_render(descriptor, raw_items, description_max=None, columnar=False):
+    items = descriptor.normalize(raw_items)
+    return serializer.dumps(recommendation_response("movie", ["Action"], items, "upstream", description_max, columnar))
+
+def measure(label, fn, iterations):
+    fn()  # warm up
+    seconds = timeit.timeit(fn, number=iterations)
+    print(f"{label:<34}{seconds / iterations * 1000:>10.2f}{len(fn()):>14}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommendation normalization benchmark")
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--description-size", type=int, default=2000)
+    parser.add_argument("--truncate", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    descriptor = RECOMMENDER_TYPES["movie"]
+    raw_items = make_raw_items(args.items, args.description_size)
+
+    print(f"{args.items} items, {args.description_size}-char descriptions, serializer backend: {serializer.JSON_BACKEND}")
+    print(f"{'path':<34}{'ms/payload':>10}{'bytes':>14}")
+    measure("normalize only: loop", lambda: legacy_normalize("movie", raw_items), args.iterations)
+    measure("normalize only: compiled", lambda: descriptor.normalize(raw_items), args.iterations)
+    measure("loop + jsonify", lambda: legacy_render(app, raw_items), args.iterations)
+    measure("compiled, rows", lambda: compiled_render(descriptor, raw_items), args.iterations)
+    measure(f"compiled, rows, truncate {args.truncate}",
+            lambda: compiled_render(descriptor, raw_items, args.truncate), args.iterations)
+    measure("compiled, rows, no description",
+            lambda: compiled_render(descriptor, raw_items, 0), args.iterations)
+    measure("compiled, columnar",
+            lambda: compiled_render(descriptor, raw_items, columnar=True), args.iterations)
+    measure(f"compiled, columnar, truncate {args.truncate}",
+            lambda: compiled_render(descriptor, raw_items, args.truncate, True), args.iterations)
+
+if __name__ == "__main__":
+    main()
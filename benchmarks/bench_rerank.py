@@ -0,0 +1,49 @@
+# Cost of the personalized re-ranking stage (utils.personalization) for
+# result lists of a few hundred items against a realistic user profile.
+#
+#     python benchmarks/bench_rerank.py --items 100 300 500
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.personalization import UserProfile, rerank_items
+
+GENRES = [f"Genre{i}" for i in range(30)]
+
+def make_items(count, rng):
+    return [{
+        "type": "movie",
+        "name": f"Movie {i}",
+        "creator": "Some Director",
+        "description": "",
+        "genre": rng.sample(GENRES, rng.randint(1, 4)),
+        "rating": round(rng.uniform(1, 10), 1)
+    } for i in range(count)]
+
+def make_profile(rng):
+    affinity = {genre.lower(): round(rng.random(), 2) for genre in rng.sample(GENRES, 10)}
+    seen = [f"Movie {rng.randint(0, 1000)}" for _ in range(500)]
+    return UserProfile(affinity, frozenset(["movie"]), seen)
+
+def main():
+    parser = argparse.ArgumentParser(description="Personalized re-ranking benchmark")
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 300, 500])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    profile = make_profile(rng)
+
+    print(f"{'items':>8}{'ms/rerank':>12}")
+    for count in args.items:
+        items = make_items(count, rng)
+        seconds = timeit.timeit(lambda: rerank_items(items, profile), number=args.iterations)
+        print(f"{count:>8}{seconds / args.iterations * 1000:>12.3f}")
+
+if __name__ == "__main__":
+    main()
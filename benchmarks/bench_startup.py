@@ -0,0 +1,98 @@
+# Startup time from a cold interpreter to the first served request:
+#   in-process: import main (create_app) and the first test-client GET of
+#               /health and of a MongoDB-backed route (/history), which now
+#               pays for creating the client;
+#   server:     from launching the server command until it answers /health.
+#
+#     python benchmarks/bench_startup.py --runs 5
+#
+# Needs MONGO_URI/SECRET_KEY in the environment or .env (the client is
+# created on the first /history request) and gunicorn on PATH for the
+# server measurement.
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IN_PROCESS = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+client = main.app.test_client()
+client.get("/health")
+health = time.perf_counter()
+client.get("/history?limit=1", headers={"Authorization": "Bearer " + sys.argv[1]})
+history = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "health_ms": (health - start) * 1000,
+    "history_ms": (history - start) * 1000
+}))
+"""
+
+def in_process_run(env, token):
+    output = subprocess.run(
+        [sys.executable, "-c", IN_PROCESS, token], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def server_run(env, args):
+    url = f"http://127.0.0.1:{args.port}/health"
+    start = time.perf_counter()
+    proc = subprocess.Popen(shlex.split(args.server_cmd.format(port=args.port)), cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + args.timeout
+        while time.perf_counter() < deadline:
+            try:
+                if requests.get(url, timeout=1).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except requests.RequestException:
+                pass
+            time.sleep(0.01)
+        return None
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-to-first-request startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=9301)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--server-cmd", default="gunicorn --workers 2 --bind 127.0.0.1:{port} main:app")
+    parser.add_argument("--skip-server", action="store_true")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ["SECRET_KEY"] = env["SECRET_KEY"]
+    sys.path.insert(0, ROOT)
+    from utils.jwt_helper import generate_jwt
+    token = generate_jwt("000000000000000000000001", "bench", "bench@example.com")
+
+    runs = [in_process_run(env, token) for _ in range(args.runs)]
+    print(f"in-process, median of {args.runs} runs (ms from interpreter start of import):")
+    for key in ("import_ms", "health_ms", "history_ms"):
+        print(f"  {key:<12}{statistics.median(run[key] for run in runs):10.1f}")
+
+    if not args.skip_server:
+        times = [server_run(env, args) for _ in range(args.runs)]
+        served = [t for t in times if t is not None]
+        if served:
+            print(f"server, launch to first /health: median {statistics.median(served):.1f} ms "
+                  f"({len(served)}/{args.runs} started)")
+        else:
+            print("server did not start")
+
+if __name__ == "__main__":
+    main()
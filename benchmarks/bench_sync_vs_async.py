@@ -0,0 +1,72 @@
+# Compares requests/sec and p99 of POST /recommend/movies between the sync
+# Flask app (main:app) and the async ASGI app (asgi:app), both pointed at a
+# local stub recommender with a fixed delay.
+#
+#     python benchmarks/bench_sync_vs_async.py --delay 0.2 --concurrency 64
+#
+# Needs MONGO_URI/SECRET_KEY in the environment or .env, plus gunicorn and
+# uvicorn on PATH. The response cache is disabled so every request reaches
+# the stub.
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_recommender import start_stub
+from load import run_load, wait_for
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async recommend endpoint load test")
+    parser.add_argument("--delay", type=float, default=0.2, help="stub recommender latency (s)")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--stub-port", type=int, default=9101)
+    parser.add_argument("--sync-cmd", default="gunicorn --workers 1 --threads 8 --bind 127.0.0.1:{port} main:app")
+    parser.add_argument("--async-cmd", default="uvicorn asgi:app --workers 1 --host 127.0.0.1 --port {port}")
+    parser.add_argument("--sync-port", type=int, default=9102)
+    parser.add_argument("--async-port", type=int, default=9103)
+    args = parser.parse_args()
+
+    start_stub(args.stub_port, "movie", args.delay)
+
+    env = dict(os.environ)
+    env["MOVIE_RECOMMENDER_URL"] = f"http://127.0.0.1:{args.stub_port}/"
+    env["RECOMMEND_CACHE_BACKEND"] = "none"
+    # One benchmark user/IP would otherwise be throttled
+    env["RATE_LIMIT_ENABLED"] = "false"
+    env.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ["SECRET_KEY"] = env["SECRET_KEY"]
+
+    from utils.jwt_helper import generate_jwt
+    token = generate_jwt("000000000000000000000001", "bench", "bench@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Distinct genres per request keep single-flight from collapsing calls
+    def payload(worker_id, i):
+        return {"type": "movie", "genre": f"genre-{worker_id}-{i}", "top_k": 10}
+
+    results = {}
+    for mode, command, port in (("sync", args.sync_cmd, args.sync_port), ("async", args.async_cmd, args.async_port)):
+        proc = subprocess.Popen(shlex.split(command.format(port=port)), cwd=ROOT, env=env)
+        try:
+            base = f"http://127.0.0.1:{port}"
+            if not wait_for(f"{base}/health"):
+                print(f"{mode} server did not start")
+                continue
+            results[mode] = run_load(f"{base}/recommend/movies", payload, headers, args.concurrency, args.duration)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"\nstub delay {args.delay * 1000:.0f}ms, concurrency {args.concurrency}, {args.duration:.0f}s per mode")
+    print(f"{'mode':<8}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<8}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}")
+
+if __name__ == "__main__":
+    main()
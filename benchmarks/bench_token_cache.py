@@ -0,0 +1,35 @@
+# Micro-benchmark: full JWT verification (decode_jwt) versus a hit in the
+# verified-token cache used by utils.auth.require_auth.
+#
+#     python benchmarks/bench_token_cache.py --iterations 200000
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from utils.jwt_helper import generate_jwt, decode_jwt
+from utils.auth import authenticate_token
+
+def main():
+    parser = argparse.ArgumentParser(description="JWT decode vs token cache hit")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    token = generate_jwt("000000000000000000000001", "bench", "bench@example.com")
+    authenticate_token(token)  # warm the cache
+
+    decode_s = timeit.timeit(lambda: decode_jwt(token), number=args.iterations)
+    cached_s = timeit.timeit(lambda: authenticate_token(token), number=args.iterations)
+
+    decode_us = decode_s / args.iterations * 1e6
+    cached_us = cached_s / args.iterations * 1e6
+    print(f"decode_jwt:       {decode_us:8.2f} us/call")
+    print(f"token cache hit:  {cached_us:8.2f} us/call")
+    print(f"speedup:          {decode_us / cached_us:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Minimal stand-in for the movie/book/TV recommender microservices, used by
+# the benchmarks. Answers every POST with top_k fake items after `delay`
+# seconds.
+import argparse
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RESPONSE_KEYS = {"movie": "movies", "book": "books", "tv": "shows"}
+
+def make_handler(rec_type, delay):
+    response_key = RESPONSE_KEYS.get(rec_type, "items")
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            genres = body.get("genres", [])
+            top_k = body.get("top_k", 10)
+
+            if delay:
+                time.sleep(delay)
+
+            items = [{
+                "title": f"{rec_type} {i}",
+                "director": "Stub Director",
+                "author": "Stub Author",
+                "description": "Stub description " * 4,
+                "genre": genres,
+                "rating": round(10 - i * 0.01, 2),
+                "year": 2000 + i % 25
+            } for i in range(top_k)]
+
+            payload = json.dumps({"status": "success", response_key: items}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+def start_stub(port, rec_type="movie", delay=0.05, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), make_handler(rec_type, delay))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub recommender")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--type", default="movie", choices=sorted(RESPONSE_KEYS))
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    start_stub(args.port, args.type, args.delay)
+    print(f"Stub {args.type} recommender on http://127.0.0.1:{args.port}/ (delay {args.delay}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
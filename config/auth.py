@@ -0,0 +1,26 @@
+from config.env import getenv
+
+# Password hashing: werkzeug method string, e.g. "pbkdf2:sha256:600000" or
+# "scrypt:32768:8:1". Changing it rehashes each user's password at their
+# next successful login.
+PASSWORD_HASH_METHOD = getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:600000")
+PASSWORD_HASH_WORKERS = int(getenv("PASSWORD_HASH_WORKERS", 2))  # 0 hashes on the request thread
+PASSWORD_HASH_QUEUE_LIMIT = int(getenv("PASSWORD_HASH_QUEUE_LIMIT", 16))  # waiting jobs beyond the busy workers
+PASSWORD_HASH_TIMEOUT = float(getenv("PASSWORD_HASH_TIMEOUT", 10))
+PASSWORD_HASH_RETRY_AFTER = int(getenv("PASSWORD_HASH_RETRY_AFTER", 1))
+# "forkserver" (the default) forks workers from a single-threaded server
+# process that preloads utils.passwords; "fork" would fork the multi-threaded
+# app process (deadlock-prone) and "spawn" starts every worker from scratch
+PASSWORD_HASH_START_METHOD = getenv("PASSWORD_HASH_START_METHOD", "forkserver")
+
+# Decoded tokens cached per process
+TOKEN_CACHE_SIZE = int(getenv("TOKEN_CACHE_SIZE", 10000))
+# Short-lived cache of user profile documents, invalidated on every write
+PROFILE_CACHE_SIZE = int(getenv("PROFILE_CACHE_SIZE", 10000))
+PROFILE_CACHE_TTL = int(getenv("PROFILE_CACHE_TTL", 30))
+
+# JWT lifetime; revocations are kept exactly this long
+TOKEN_LIFETIME = int(getenv("TOKEN_LIFETIME", 7 * 24 * 3600))
+# Logout revocations are per process with "memory"; "redis" shares them
+# between workers (one Redis read per authenticated request)
+TOKEN_REVOCATION_BACKEND = getenv("TOKEN_REVOCATION_BACKEND", "memory")  # memory | redis
@@ -1,41 +1,183 @@
-from pymongo import MongoClient
 import os
-from dotenv import load_dotenv
+import threading
+from pymongo import MongoClient, ReadPreference
+from pymongo.write_concern import WriteConcern
+from config.env import getenv
+from utils.metrics import mongo_event_listeners
+from utils.mongo_pool import mongo_pool_stats
 
-load_dotenv()
+# Connection pool and timeouts. A Mongo stall now surfaces as an error
+# after these limits instead of a request thread that hangs forever.
+MONGO_MAX_POOL_SIZE = int(getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))  # wait for a pooled connection
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(getenv("MONGO_SOCKET_TIMEOUT_MS", 20000))  # 0 = no timeout
+MONGO_COMPRESSORS = getenv("MONGO_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib"
+
+# History reads (listing, export, stats, fallback index) and per-user stats
+# documents may be served by a secondary; "primary" restores
+# read-your-writes for them
+MONGO_HISTORY_READ_PREFERENCE = getenv("MONGO_HISTORY_READ_PREFERENCE", "secondaryPreferred")
+# History writes are best effort: 1 waits for the primary, 0 does not wait
+MONGO_HISTORY_WRITE_CONCERN = int(getenv("MONGO_HISTORY_WRITE_CONCERN", 1))
+
+# "background" builds missing indexes on a daemon thread when a process
+# first connects; "manual" leaves it to `flask create-indexes`. Either way
+# the unique users indexes are checked (and in background mode created)
+# synchronously before the first account is written.
+MONGO_INDEX_MODE = getenv("MONGO_INDEX_MODE", "background")
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST
+}
 
 client = None
 db = None
+history_reads = None
+history_writes = None
+stats_reads = None
+_client_pid = None
+_client_lock = threading.Lock()
+_unique_indexes_ready = False
+_unique_indexes_warned = False
+_unique_indexes_lock = threading.Lock()
+
+# Signup uniqueness rests on these; see ensure_unique_indexes
+UNIQUE_USER_INDEXES = ("email", "username")
+
+def client_options():
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS or None
+    }
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
 
 def init_db():
-    global client, db
-    
-    MONGO_URI = os.getenv('MONGO_URI')
-    DATABASE_NAME = os.getenv('DATABASE_NAME', 'recommendation_system')
-    
+    # Creates this process's client. MongoClient is not fork-safe, so it is
+    # created lazily on first use: under a pre-fork server each worker gets
+    # its own client after the fork, and a client inherited from the parent
+    # is replaced. No round trip is made here; the first query connects.
+    global client, db, history_reads, history_writes, stats_reads, _client_pid
+
+    MONGO_URI = getenv('MONGO_URI')
+    DATABASE_NAME = getenv('DATABASE_NAME', 'recommendation_system')
+
     if not MONGO_URI:
         raise ValueError("MONGO_URI environment variable is required")
-    
-    try:
-        client = MongoClient(MONGO_URI)
+
+    read_preference = READ_PREFERENCES.get(MONGO_HISTORY_READ_PREFERENCE)
+    if read_preference is None:
+        raise ValueError(f"Unknown MONGO_HISTORY_READ_PREFERENCE '{MONGO_HISTORY_READ_PREFERENCE}'")
+
+    with _client_lock:
+        if db is not None and _client_pid == os.getpid():
+            return db
+
+        client = MongoClient(
+            MONGO_URI,
+            event_listeners=mongo_event_listeners() + [mongo_pool_stats],
+            **client_options()
+        )
         db = client[DATABASE_NAME]
-        
-        # Test connection
-        client.admin.command('ping')
-        print(f"Connected to MongoDB database: {DATABASE_NAME}")
-        
-        # Create indexes for performance
-        db.users.create_index("email", unique=True)
-        db.users.create_index("username", unique=True)
-        db.history.create_index([("user_id", 1), ("timestamp", -1)])
-        
+        history_reads = db.history.with_options(read_preference=read_preference)
+        history_writes = db.history.with_options(write_concern=WriteConcern(w=MONGO_HISTORY_WRITE_CONCERN))
+        stats_reads = db.user_stats.with_options(read_preference=read_preference)
+        _client_pid = os.getpid()
+        print(f"MongoDB client created for database {DATABASE_NAME} (pid {_client_pid})")
+
+        if MONGO_INDEX_MODE == "background":
+            threading.Thread(target=_ensure_indexes_quietly, args=(db,), name="mongo-indexes", daemon=True).start()
         return db
+
+def ensure_indexes(database=None):
+    # Idempotent; an index that already exists costs one round trip
+    global _unique_indexes_ready
+    database = database if database is not None else get_db()
+    for field in UNIQUE_USER_INDEXES:
+        database.users.create_index(field, unique=True)
+    _unique_indexes_ready = True
+    # _id breaks timestamp ties for keyset pagination of /history
+    database.history.create_index([("user_id", 1), ("timestamp", -1), ("_id", -1)])
+    # Incremental reads of the fallback index
+    database.history.create_index("timestamp")
+
+def _has_unique_index(indexes, field):
+    return any(
+        info.get("unique") and [key for key, _ in info.get("key", [])] == [field]
+        for info in indexes.values()
+    )
+
+def ensure_unique_indexes():
+    # True once the unique users indexes are known to exist. Until then
+    # (manual mode, indexes not created yet) it re-checks on every call and
+    # duplicates are only refused by the signup pre-check, which two
+    # concurrent signups can both pass.
+    global _unique_indexes_ready, _unique_indexes_warned
+    if _unique_indexes_ready:
+        return True
+    with _unique_indexes_lock:
+        if _unique_indexes_ready:
+            return True
+        users = get_db().users
+        indexes = users.index_information()
+        missing = [field for field in UNIQUE_USER_INDEXES if not _has_unique_index(indexes, field)]
+        if missing and MONGO_INDEX_MODE == "background":
+            for field in missing:
+                users.create_index(field, unique=True)
+            missing = []
+        if missing:
+            if not _unique_indexes_warned:
+                _unique_indexes_warned = True
+                print(f"Unique users indexes missing on {', '.join(missing)}; run `flask create-indexes`")
+            return False
+        _unique_indexes_ready = True
+        return True
+
+def _ensure_indexes_quietly(database):
+    try:
+        ensure_indexes(database)
     except Exception as e:
-        print(f"Failed to connect to MongoDB: {e}")
-        raise e
+        print(f"Failed to create MongoDB indexes: {e}")
 
 def get_db():
-    global db
-    if db is None:
+    if db is None or _client_pid != os.getpid():
         init_db()
-    return db
\ No newline at end of file
+    return db
+
+# db.history with the configured read preference
+def get_history_reads():
+    get_db()
+    return history_reads
+
+# db.history with the configured (best-effort) write concern
+def get_history_writes():
+    get_db()
+    return history_writes
+
+# db.user_stats with the history read preference
+def get_stats_reads():
+    get_db()
+    return stats_reads
+
+def get_pool_stats():
+    return {
+        "options": {
+            **client_options(),
+            "history_read_preference": MONGO_HISTORY_READ_PREFERENCE,
+            "history_write_concern": MONGO_HISTORY_WRITE_CONCERN,
+            "index_mode": MONGO_INDEX_MODE
+        },
+        "pools": mongo_pool_stats.stats()
+    }
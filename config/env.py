@@ -0,0 +1,9 @@
+import os
+from dotenv import load_dotenv
+
+# .env is read once per process, by the first module that imports this
+# one; variables already set in the environment take precedence. Config
+# modules read settings through getenv below.
+load_dotenv()
+
+getenv = os.getenv
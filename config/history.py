@@ -0,0 +1,10 @@
+from config.env import getenv
+
+# Background history writer
+HISTORY_WRITE_MODE = getenv("HISTORY_WRITE_MODE", "async")  # async | sync
+HISTORY_QUEUE_SIZE = int(getenv("HISTORY_QUEUE_SIZE", 10000))
+HISTORY_BATCH_SIZE = int(getenv("HISTORY_BATCH_SIZE", 100))
+HISTORY_FLUSH_INTERVAL = float(getenv("HISTORY_FLUSH_INTERVAL", 1.0))
+HISTORY_QUEUE_POLICY = getenv("HISTORY_QUEUE_POLICY", "drop")  # drop | block
+HISTORY_BLOCK_TIMEOUT = float(getenv("HISTORY_BLOCK_TIMEOUT", 0.5))
+HISTORY_SHUTDOWN_TIMEOUT = float(getenv("HISTORY_SHUTDOWN_TIMEOUT", 10))
@@ -0,0 +1,16 @@
+from config.env import getenv
+
+METRICS_ENABLED = getenv("METRICS_ENABLED", "true").lower() == "true"
+# Time every MongoDB command through a pymongo command listener
+MONGO_COMMAND_METRICS = getenv("MONGO_COMMAND_METRICS", "true").lower() == "true"
+# Latency histogram buckets (seconds): powers of two from the smallest
+# bound, so each bucket is twice as wide as the previous one
+METRICS_BUCKET_MIN = float(getenv("METRICS_BUCKET_MIN", 0.0005))
+METRICS_BUCKET_COUNT = int(getenv("METRICS_BUCKET_COUNT", 16))  # 0.5ms .. ~16s
+# Ops endpoints (/metrics, /db/pool-stats, /recommend/stats) answer only
+# callers sending "Authorization: Bearer <token>"; with no token they are
+# closed. METRICS_ALLOW_LOOPBACK also lets in 127.0.0.1/::1 without one,
+# unless RATE_LIMIT_TRUST_PROXY says a proxy is in front (then every
+# client arrives from loopback).
+METRICS_TOKEN = getenv("METRICS_TOKEN")
+METRICS_ALLOW_LOOPBACK = getenv("METRICS_ALLOW_LOOPBACK", "false").lower() == "true"
@@ -0,0 +1,18 @@
+from config.env import getenv
+
+RATE_LIMIT_ENABLED = getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = getenv("RATE_LIMIT_BACKEND", "memory")  # memory | redis
+RATE_LIMIT_REDIS_URL = getenv("RATE_LIMIT_REDIS_URL", getenv("REDIS_URL", "redis://localhost:6379/0"))
+RATE_LIMIT_MAX_KEYS = int(getenv("RATE_LIMIT_MAX_KEYS", 100000))  # in-process keys kept; least recently used go first
+# Use the first X-Forwarded-For address as the client IP (behind a proxy)
+RATE_LIMIT_TRUST_PROXY = getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+
+# name=requests/seconds:burst:key, where key is "user" (JWT user_id,
+# falling back to the IP) or "ip"
+DEFAULT_RATE_LIMITS = (
+    "recommend=20/1:40:user,"
+    "feed=5/1:10:user,"
+    "login=10/60:5:ip,"
+    "signup=5/60:5:ip"
+)
+RATE_LIMITS = getenv("RATE_LIMITS", DEFAULT_RATE_LIMITS)
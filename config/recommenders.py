@@ -0,0 +1,90 @@
+from config.env import getenv
+
+def _replica_urls(value):
+    # "http://a:8000/recommend, http://b:8000/recommend" -> one entry per replica
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+RECOMMENDER_ENDPOINTS = {
+    "movie": _replica_urls(getenv("MOVIE_RECOMMENDER_URL")),
+    "book": _replica_urls(getenv("BOOK_RECOMMENDER_URL")),
+    "tv": _replica_urls(getenv("TV_RECOMMENDER_URL"))
+}
+
+RESPONSE_KEYS = {
+    "movie": "movies",
+    "book": "books",
+    "tv": "shows"
+}
+
+# Upstream HTTP client settings (shared by all recommender types)
+POOL_SIZE = int(getenv("RECOMMENDER_POOL_SIZE", 20))
+POOL_BLOCK = getenv("RECOMMENDER_POOL_BLOCK", "false").lower() == "true"
+KEEP_ALIVE = getenv("RECOMMENDER_KEEP_ALIVE", "true").lower() == "true"
+CONNECT_TIMEOUT = float(getenv("RECOMMENDER_CONNECT_TIMEOUT", 2))
+READ_TIMEOUT = float(getenv("RECOMMENDER_READ_TIMEOUT", 10))
+
+# Recommendation response cache
+CACHE_BACKEND = getenv("RECOMMEND_CACHE_BACKEND", "memory")  # memory | redis | none
+CACHE_TTL = int(getenv("RECOMMEND_CACHE_TTL", 300))
+CACHE_MAX_ENTRIES = int(getenv("RECOMMEND_CACHE_MAX_ENTRIES", 1000))
+REDIS_URL = getenv("REDIS_URL", "redis://localhost:6379/0")
+# Seconds; a stalled Redis costs a request at most this long
+REDIS_SOCKET_TIMEOUT = float(getenv("REDIS_SOCKET_TIMEOUT", 0.25))
+REDIS_CONNECT_TIMEOUT = float(getenv("REDIS_CONNECT_TIMEOUT", 0.25))
+# After a Redis error the cache is bypassed (every get misses) this long
+REDIS_RETRY_INTERVAL = float(getenv("REDIS_RETRY_INTERVAL", 5))
+
+# Mixed feed fan-out
+FEED_MAX_WORKERS = int(getenv("FEED_MAX_WORKERS", 32))
+FEED_DEADLINE = float(getenv("FEED_DEADLINE", 3))
+FEED_DEADLINES = {
+    rec_type: float(getenv(f"{rec_type.upper()}_FEED_DEADLINE", FEED_DEADLINE))
+    for rec_type in RECOMMENDER_ENDPOINTS
+}
+
+# Upstream resilience: circuit breaker, adaptive timeouts, hedged requests
+BREAKER_FAILURE_THRESHOLD = int(getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(getenv("BREAKER_RESET_TIMEOUT", 30))
+ADAPTIVE_TIMEOUT = getenv("ADAPTIVE_TIMEOUT", "true").lower() == "true"
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", 3))
+MIN_READ_TIMEOUT = float(getenv("MIN_READ_TIMEOUT", 0.5))
+LATENCY_WINDOW = int(getenv("LATENCY_WINDOW", 200))
+LATENCY_MIN_SAMPLES = int(getenv("LATENCY_MIN_SAMPLES", 20))
+HEDGE_REQUESTS = getenv("HEDGE_REQUESTS", "false").lower() == "true"
+HEDGE_PERCENTILE = float(getenv("HEDGE_PERCENTILE", 95))
+STALE_RESULT_TTL = int(getenv("STALE_RESULT_TTL", 86400))
+
+# Client-side load balancing across replicas
+LB_STRATEGY = getenv("RECOMMENDER_LB_STRATEGY", "p2c")  # p2c | least_outstanding | random
+REPLICA_EJECT_FAILURES = int(getenv("REPLICA_EJECT_FAILURES", 3))
+REPLICA_EJECT_DURATION = float(getenv("REPLICA_EJECT_DURATION", 30))
+
+# In-process genre index over stored history, served when an upstream fails
+FALLBACK_ENABLED = getenv("FALLBACK_ENABLED", "true").lower() == "true"
+FALLBACK_REFRESH_INTERVAL = float(getenv("FALLBACK_REFRESH_INTERVAL", 60))
+FALLBACK_INITIAL_SCAN = int(getenv("FALLBACK_INITIAL_SCAN", 20000))  # most recent history rows read at startup
+FALLBACK_MAX_ITEMS = int(getenv("FALLBACK_MAX_ITEMS", 50000))  # per recommender type
+# Seconds of history re-read on every pass, for rows that are stored late
+# (queued history writes) or with out-of-order ObjectIds (other hosts)
+FALLBACK_REREAD_WINDOW = float(getenv("FALLBACK_REREAD_WINDOW", 120))
+
+# Personalized re-ranking of single-type recommendations
+PERSONALIZE = getenv("PERSONALIZE", "true").lower() == "true"
+PROFILE_TTL = int(getenv("PERSONALIZE_PROFILE_TTL", 300))
+PROFILE_MAX_USERS = int(getenv("PERSONALIZE_PROFILE_MAX_USERS", 10000))
+AFFINITY_WEIGHT = float(getenv("PERSONALIZE_AFFINITY_WEIGHT", 0.5))
+SEEN_PENALTY = float(getenv("PERSONALIZE_SEEN_PENALTY", 0.5))
+SEEN_ITEMS_PER_USER = int(getenv("PERSONALIZE_SEEN_ITEMS", 500))
+SEEN_HISTORY_ENTRIES = int(getenv("PERSONALIZE_SEEN_HISTORY_ENTRIES", 20))  # history rows read to seed the seen set
+# Profiles are built off the request path; a miss is served in upstream order
+PROFILE_BUILD_WORKERS = int(getenv("PERSONALIZE_PROFILE_WORKERS", 2))
+PROFILE_MAX_PENDING = int(getenv("PERSONALIZE_PROFILE_MAX_PENDING", 100))
+PROFILE_RETRY_INTERVAL = float(getenv("PERSONALIZE_PROFILE_RETRY_INTERVAL", 10))  # no builds this long after one fails
+
+# Login-time prefetch of likely first recommendations into the cache
+PREFETCH_ON_LOGIN = getenv("PREFETCH_ON_LOGIN", "false").lower() == "true"
+PREFETCH_MAX_WORKERS = int(getenv("PREFETCH_MAX_WORKERS", 4))
+PREFETCH_MAX_PENDING = int(getenv("PREFETCH_MAX_PENDING", 100))  # queued upstream calls; more are skipped
+PREFETCH_MAX_QUERIES = int(getenv("PREFETCH_MAX_QUERIES", 6))  # per login
+PREFETCH_HISTORY_ENTRIES = int(getenv("PREFETCH_HISTORY_ENTRIES", 5))
+PREFETCH_TOP_K = int(getenv("PREFETCH_TOP_K", 10))
@@ -1,33 +1,68 @@
+import click
 from flask import Flask
 from flask_cors import CORS
-from config.database import init_db
+from config.env import getenv
+from config.database import ensure_indexes, get_pool_stats
 from routes.auth import auth_bp
 from routes.recommend import recommend_bp
 from routes.history import history_bp
 from routes.user import user_bp
-import os
-from dotenv import load_dotenv
+from models.user_stats import UserStats
+from utils.metrics import instrument_app, metrics_response, internal_only
 
-load_dotenv()
+# Builds the app without touching MongoDB: each process creates its own
+# client on first use (see config.database.init_db), so importing this
+# module is cheap and safe to do before a pre-fork server forks.
+def create_app():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = getenv('SECRET_KEY')
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    # Enable CORS
+    CORS(app)
 
-# Enable CORS
-CORS(app)
+    # Request latency histograms for /metrics
+    instrument_app(app)
 
-# Initialize MongoDB
-init_db()
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(recommend_bp)
+    app.register_blueprint(history_bp)
+    app.register_blueprint(user_bp, url_prefix='/user')
 
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/auth')
-app.register_blueprint(recommend_bp)
-app.register_blueprint(history_bp)
-app.register_blueprint(user_bp, url_prefix='/user')
+    @app.cli.command("create-indexes")
+    def create_indexes():
+        """Create the MongoDB indexes the app relies on."""
+        ensure_indexes()
+        print("Indexes are up to date")
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    return {"status": "healthy", "message": "Flask backend is running"}, 200
+    @app.cli.command("rebuild-user-stats")
+    @click.option("--user-id", "user_ids", multiple=True, help="Only rebuild these users (repeatable)")
+    @click.option("--batch-size", default=500, show_default=True, help="Users per aggregation batch")
+    def rebuild_user_stats(user_ids, batch_size):
+        """Recompute per-user history stats from raw history."""
+        written = UserStats.rebuild(user_ids=list(user_ids) or None, batch_size=batch_size)
+        print(f"Rebuilt stats for {written} users")
+
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        return {"status": "healthy", "message": "Flask backend is running"}, 200
+
+    # MongoDB client settings and per-server connection pool counters
+    @app.route('/db/pool-stats', methods=['GET'])
+    @internal_only
+    def db_pool_stats():
+        return {"status": "success", **get_pool_stats()}, 200
+
+    # Prometheus text format; rendered only when scraped
+    @app.route('/metrics', methods=['GET'])
+    @internal_only
+    def metrics_endpoint():
+        return metrics_response()
+
+    return app
+
+# gunicorn main:app / flask --app main
+app = create_app()
 
 if __name__ == "__main__":
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    app.run(port=5000, debug=True)
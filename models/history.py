@@ -1,8 +1,43 @@
+import base64
 from datetime import datetime, timezone
-from config.database import get_db
+from config.database import get_history_reads, get_history_writes
 from bson import ObjectId
+from bson.errors import InvalidId
+from config.history import HISTORY_WRITE_MODE
+from utils.history_writer import history_writer
+from models.user_stats import UserStats
+
+# Fields the history list UI needs; items and query_params stay on the server
+SUMMARY_PROJECTION = {
+    "recommendation_type": 1,
+    "genre": 1,
+    "timestamp": 1
+}
+
+class InvalidCursorError(ValueError):
+    pass
+
+# Opaque keyset cursor: the last row's timestamp (ms) plus its _id as a
+# tiebreaker for rows written in the same millisecond
+def encode_history_cursor(timestamp, history_id):
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    millis = int(timestamp.timestamp() * 1000)
+    raw = f"{millis}:{history_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_history_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        millis, history_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+        timestamp = datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc)
+        return timestamp, ObjectId(history_id)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
 
 class History:
+    __slots__ = ("user_id", "recommendation_type", "genre", "items", "query_params", "timestamp")
+
     def __init__(self, user_id, recommendation_type, genre, items, query_params=None):
         self.user_id = ObjectId(user_id)
         self.recommendation_type = recommendation_type
@@ -11,9 +46,8 @@ class History:
         self.query_params = query_params or {}
         self.timestamp = datetime.now(timezone.utc)
         
-    def save(self):
-        db = get_db()
-        history_data = {
+    def to_document(self):
+        return {
             "user_id": self.user_id,
             "recommendation_type": self.recommendation_type,
             "genre": self.genre,
@@ -21,29 +55,131 @@ class History:
             "query_params": self.query_params,
             "timestamp": self.timestamp
         }
-        result = db.history.insert_one(history_data)
+
+    def save(self):
+        document = self.to_document()
+        marked = UserStats.mark_pending_quietly([document])
+        try:
+            result = get_history_writes().insert_one(document)
+        except Exception:
+            if marked:
+                UserStats.record_many_quietly([], [document])
+            raise
+        UserStats.record_many_quietly([document], [document] if marked else ())
         return str(result.inserted_id)
+
+    def save_async(self):
+        # Hands the record to the background writer; returns False if it was
+        # dropped because the queue is full
+        if HISTORY_WRITE_MODE != "async":
+            self.save()
+            return True
+        return history_writer.enqueue(self.to_document())
     
     @staticmethod
-    def get_user_history(user_id, limit=50, offset=0):
-        db = get_db()
+    def get_user_history_page(user_id, limit=50, cursor=None, offset=0, summary=False, item_count=True):
+        # Returns (history, next_cursor). With a cursor the page is read by
+        # seeking on the (user_id, timestamp, _id) index, so deep pages cost
+        # the same as the first one; offset is kept for older clients.
+        # summary=True leaves items and query_params on the server and
+        # optionally returns the item count instead.
+        collection = get_history_reads()
+        seek = decode_history_cursor(cursor) if cursor else None
+
         try:
-            history = list(db.history.find(
-                {"user_id": ObjectId(user_id)}
-            ).sort("timestamp", -1).skip(offset).limit(limit))
-            
-            # Convert ObjectId to string for JSON serialization
-            for item in history:
-                item["_id"] = str(item["_id"])
-                item["user_id"] = str(item["user_id"])
-                
-            return history
+            query = {"user_id": ObjectId(user_id)}
+            if seek:
+                timestamp, last_id = seek
+                query["$or"] = [
+                    {"timestamp": {"$lt": timestamp}},
+                    {"timestamp": timestamp, "_id": {"$lt": last_id}}
+                ]
+
+            projection = None
+            if summary:
+                projection = dict(SUMMARY_PROJECTION)
+                if item_count:
+                    projection["item_count"] = {"$size": {"$ifNull": ["$items", []]}}
+
+            find = collection.find(query, projection).sort([("timestamp", -1), ("_id", -1)])
+            if offset and not cursor:
+                find = find.skip(offset)
+            history = list(find.limit(limit))
+
+            next_cursor = None
+            if len(history) == limit and history:
+                next_cursor = encode_history_cursor(history[-1]["timestamp"], history[-1]["_id"])
+
+            # Rows keep their BSON types; utils.serializer renders them
+            return history, next_cursor
         except:
-            return []
+            return [], None
+
+    @staticmethod
+    def iter_user_history(user_id, since=None, after_id=None, batch_size=500):
+        # Oldest-first cursor over a user's whole history for exports. Rows
+        # at `since` are included unless `after_id` is given, in which case
+        # the export resumes right after that row.
+        collection = get_history_reads()
+        query = {"user_id": ObjectId(user_id)}
+        if since is not None and after_id is not None:
+            query["$or"] = [
+                {"timestamp": {"$gt": since}},
+                {"timestamp": since, "_id": {"$gt": ObjectId(after_id)}}
+            ]
+        elif since is not None:
+            query["timestamp"] = {"$gte": since}
+
+        return collection.find(query).sort([("timestamp", 1), ("_id", 1)]).batch_size(batch_size)
+
+    @staticmethod
+    def get_recent_queries(user_id, entries=5):
+        # (recommendation_type, genre, top_k) of the user's latest requests,
+        # newest first
+        collection = get_history_reads()
+        rows = collection.find(
+            {"user_id": ObjectId(user_id)}, {"recommendation_type": 1, "genre": 1, "query_params.top_k": 1, "_id": 0}
+        ).sort([("timestamp", -1), ("_id", -1)]).limit(entries)
+        return [
+            (row.get("recommendation_type"), row.get("genre"), (row.get("query_params") or {}).get("top_k"))
+            for row in rows
+        ]
+
+    @staticmethod
+    def get_recent_item_names(user_id, entries=20):
+        # Names of the items in the user's most recent history rows, newest
+        # first; only the names are read
+        collection = get_history_reads()
+        rows = collection.find(
+            {"user_id": ObjectId(user_id)}, {"items.name": 1, "_id": 0}
+        ).sort([("timestamp", -1), ("_id", -1)]).limit(entries)
+        return [item.get("name") for row in rows for item in row.get("items") or [] if item.get("name")]
+
+    @staticmethod
+    def get_user_history_entry(user_id, history_id):
+        collection = get_history_reads()
+        try:
+            entry = collection.find_one({"_id": ObjectId(history_id), "user_id": ObjectId(user_id)})
+        except InvalidId:
+            return None
+
+        return entry
     
     @staticmethod
     def get_user_stats(user_id):
-        db = get_db()
+        # Single read of the incrementally maintained stats document; users
+        # that have not been backfilled yet fall back to aggregation
+        try:
+            stats = UserStats.get(user_id)
+            if stats is not None:
+                return stats
+        except Exception as e:
+            print(f"Failed to read user stats: {e}")
+        return History.aggregate_user_stats(user_id)
+
+    @staticmethod
+    def aggregate_user_stats(user_id):
+        collection = get_history_reads()
         try:
             # Type statistics
             type_pipeline = [
@@ -54,7 +190,7 @@ class History:
                     "last_accessed": {"$max": "$timestamp"}
                 }}
             ]
-            type_stats = list(db.history.aggregate(type_pipeline))
+            type_stats = list(collection.aggregate(type_pipeline))
             
             # Genre preferences - handle both string and array genres
             genre_pipeline = [
@@ -67,9 +203,9 @@ class History:
                 {"$sort": {"count": -1}},
                 {"$limit": 10}
             ]
-            genre_stats = list(db.history.aggregate(genre_pipeline))
+            genre_stats = list(collection.aggregate(genre_pipeline))
             
-            total_count = db.history.count_documents({"user_id": ObjectId(user_id)})
+            total_count = collection.count_documents({"user_id": ObjectId(user_id)})
             
             return {
                 "type_stats": type_stats,
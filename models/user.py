@@ -1,18 +1,43 @@
+import threading
 from datetime import datetime, timezone
-from werkzeug.security import generate_password_hash, check_password_hash
-from config.database import get_db
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from config.auth import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+from config.database import get_db, ensure_unique_indexes
+from utils.cache import MemoryCache
+from utils.passwords import password_hasher
+from models.user_stats import UserStats
 from bson import ObjectId
 
+DEFAULT_PREFERENCES = {"genres": [], "types": []}
+
+# Everything but the password hash; used for profile reads
+PROFILE_PROJECTION = {"password_hash": 0}
+
+# Short-lived cache of profile documents, invalidated on every write
+profile_cache = MemoryCache(max_entries=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+
+# Serializes check-then-insert while the unique indexes are missing
+_signup_lock = threading.Lock()
+
 class User:
+    __slots__ = ("_id", "username", "email", "password_hash", "preferences", "created_at", "last_login")
+
     def __init__(self, username=None, email=None, password=None, preferences=None):
         self.username = username
         self.email = email
-        self.password_hash = generate_password_hash(password) if password else None
+        # Hashed in the password worker pool; may raise PasswordHasherBusy
+        self.password_hash = password_hasher.hash(password) if password else None
         self.preferences = preferences or {"genres": [], "types": []}
         self.created_at = datetime.now(timezone.utc)
         self.last_login = None
         
     def save(self):
+        # The unique email/username indexes are the authority; a concurrent
+        # duplicate raises DuplicateKeyError (see duplicate_field). They are
+        # made sure of before the first insert, not left to the background
+        # index build.
+        indexed = ensure_unique_indexes()
         db = get_db()
         user_data = {
             "username": self.username,
@@ -22,62 +47,97 @@ class User:
             "created_at": self.created_at,
             "last_login": self.last_login
         }
-        result = db.users.insert_one(user_data)
+        if indexed:
+            result = db.users.insert_one(user_data)
+        else:
+            # Without the indexes (manual mode, not built yet) at least this
+            # process never stores a duplicate; other processes still can
+            with _signup_lock:
+                taken = User.taken_field(self.email, self.username)
+                if taken is not None:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error index: {taken}_1", 11000, {"keyPattern": {taken: 1}}
+                    )
+                result = db.users.insert_one(user_data)
+        self._id = result.inserted_id
+        try:
+            UserStats.create(self._id)
+        except Exception as e:
+            # /history/stats falls back to aggregation without it
+            print(f"Failed to create user stats: {e}")
         return str(result.inserted_id)
-    
+
     @staticmethod
-    def find_by_email(email):
+    def taken_field(email, username):
+        # "email", "username" or None. One indexed read, so signups for an
+        # existing account are refused before any password hashing.
         db = get_db()
-        user_data = db.users.find_one({"email": email})
-        if user_data:
-            user = User()
-            user._id = user_data["_id"]
-            user.username = user_data["username"]
-            user.email = user_data["email"]
-            user.password_hash = user_data["password_hash"]
-            user.preferences = user_data.get("preferences", {"genres": [], "types": []})
-            user.created_at = user_data["created_at"]
-            user.last_login = user_data.get("last_login")
-            return user
+        existing = db.users.find_one(
+            {"$or": [{"email": email}, {"username": username}]}, {"email": 1, "username": 1}
+        )
+        if existing is None:
+            return None
+        return "email" if existing.get("email") == email else "username"
+
+    @staticmethod
+    def duplicate_field(error):
+        # Maps a DuplicateKeyError from save() to "email" or "username"
+        key_pattern = (error.details or {}).get("keyPattern") or {}
+        for field in ("email", "username"):
+            if field in key_pattern:
+                return field
+        message = str(error)
+        for field in ("email", "username"):
+            if f"{field}_1" in message:
+                return field
         return None
-    
+
+    @staticmethod
+    def from_document(user_data):
+        user = User()
+        user._id = user_data["_id"]
+        user.username = user_data.get("username")
+        user.email = user_data.get("email")
+        user.password_hash = user_data.get("password_hash")
+        user.preferences = user_data.get("preferences", DEFAULT_PREFERENCES)
+        user.created_at = user_data.get("created_at")
+        user.last_login = user_data.get("last_login")
+        return user
+
     @staticmethod
-    def find_by_username(username):
+    def find_by_email(email):
         db = get_db()
-        user_data = db.users.find_one({"username": username})
+        user_data = db.users.find_one({"email": email})
         if user_data:
-            user = User()
-            user._id = user_data["_id"]
-            user.username = user_data["username"]
-            user.email = user_data["email"]
-            user.password_hash = user_data["password_hash"]
-            user.preferences = user_data.get("preferences", {"genres": [], "types": []})
-            user.created_at = user_data["created_at"]
-            user.last_login = user_data.get("last_login")
-            return user
+            return User.from_document(user_data)
         return None
     
     @staticmethod
     def find_by_id(user_id):
-        db = get_db()
-        try:
-            user_data = db.users.find_one({"_id": ObjectId(user_id)})
-            if user_data:
-                user = User()
-                user._id = user_data["_id"]
-                user.username = user_data["username"]
-                user.email = user_data["email"]
-                user.password_hash = user_data["password_hash"]
-                user.preferences = user_data.get("preferences", {"genres": [], "types": []})
-                user.created_at = user_data["created_at"]
-                user.last_login = user_data.get("last_login")
-                return user
-        except:
-            pass
-        return None
+        # Profile read: no password hash, served from the profile cache
+        user_data = profile_cache.get(str(user_id))
+        if user_data is None:
+            db = get_db()
+            try:
+                user_data = db.users.find_one({"_id": ObjectId(user_id)}, PROFILE_PROJECTION)
+            except:
+                return None
+            if not user_data:
+                return None
+            profile_cache.set(str(user_id), user_data)
+        return User.from_document(user_data)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Verified in the password worker pool (may raise PasswordHasherBusy).
+        # A hash made with an older method is replaced on success.
+        if not self.password_hash:
+            return False
+        matches, new_hash = password_hasher.verify(self.password_hash, password)
+        if matches and new_hash is not None:
+            self.password_hash = new_hash
+            db = get_db()
+            db.users.update_one({"_id": self._id}, {"$set": {"password_hash": new_hash}})
+        return matches
     
     def update_last_login(self):
         db = get_db()
@@ -86,11 +146,23 @@ class User:
             {"_id": self._id},
             {"$set": {"last_login": self.last_login}}
         )
+        profile_cache.delete(str(self._id))
     
-    def update_preferences(self, preferences):
+    @staticmethod
+    def set_preferences(user_id, preferences):
+        # One round trip: returns the stored preferences, or None if the user
+        # does not exist
         db = get_db()
-        self.preferences = preferences
-        db.users.update_one(
-            {"_id": self._id},
-            {"$set": {"preferences": preferences}}
-        )
+        try:
+            user_data = db.users.find_one_and_update(
+                {"_id": ObjectId(user_id)},
+                {"$set": {"preferences": preferences}},
+                projection={"preferences": 1},
+                return_document=ReturnDocument.AFTER
+            )
+        except:
+            return None
+        profile_cache.delete(str(user_id))
+        if user_data is None:
+            return None
+        return user_data.get("preferences", DEFAULT_PREFERENCES)
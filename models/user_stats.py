@@ -0,0 +1,264 @@
+from collections import Counter
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from config.database import get_db, get_stats_reads
+from bson import ObjectId
+
+# Per-user running totals for /history/stats, kept in db.user_stats with
+# the user's ObjectId as _id:
+#   {total, types: {<type>: {count, last_accessed}}, genres: {<genre>: count}}
+# Every history write applies $inc/$max to it, so reading the stats is a
+# single _id lookup instead of aggregating the whole history. Real
+# documents are only created for new users (at signup) and by rebuild();
+# writes never start one with counts, because a document started from a
+# user's first new write would hide all of their older history.
+#
+# Writers mark their documents as `pending` before inserting the history
+# rows and clear the mark in the same update that applies the counts, and
+# `version` counts those updates. rebuild() replaces a document only when
+# nothing is pending and the version is the one it read before
+# aggregating, so no row is ever counted by both.
+
+# Rebuild attempts per user before giving up on a busy user
+REBUILD_ATTEMPTS = 3
+
+# Stands in for a user's stats until rebuild() writes them; get() ignores it
+PLACEHOLDER = {"total": 0, "types": {}, "genres": {}, "version": 0, "rebuilding": True}
+
+def _escape_key(key):
+    # Genre and type names become field names; keep '.' and '$' out of them
+    return str(key).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def _unescape_key(key):
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+def _genres_of(document):
+    # Empty names ("Action," splits into "Action" and "") have no field
+    # name to count under and are skipped
+    genre = document.get("genre")
+    if genre is None:
+        return []
+    if not isinstance(genre, list):
+        genre = [genre]
+    return [g for g in genre if g is not None and str(g).strip()]
+
+def _by_user(documents):
+    by_user = {}
+    for document in documents:
+        by_user.setdefault(document["user_id"], []).append(document)
+    return by_user
+
+class UserStats:
+    @staticmethod
+    def build_update(documents, pending=0):
+        # Folds one user's history documents into a single update spec,
+        # clearing `pending` marks taken for them by mark_pending
+        inc = Counter()
+        last_accessed = {}
+        for document in documents:
+            type_key = _escape_key(document.get("recommendation_type"))
+            inc["total"] += 1
+            inc[f"types.{type_key}.count"] += 1
+            for genre in _genres_of(document):
+                inc[f"genres.{_escape_key(genre)}"] += 1
+
+            timestamp = document.get("timestamp")
+            path = f"types.{type_key}.last_accessed"
+            if timestamp and (path not in last_accessed or timestamp > last_accessed[path]):
+                last_accessed[path] = timestamp
+
+        inc["version"] += 1
+        if pending:
+            inc["pending"] -= pending
+        update = {"$inc": dict(inc)}
+        if last_accessed:
+            update["$max"] = last_accessed
+        return update
+
+    @staticmethod
+    def create(user_id):
+        # Empty stats for a user with no history yet
+        try:
+            get_db().user_stats.insert_one(
+                {"_id": ObjectId(user_id), "total": 0, "types": {}, "genres": {}, "version": 0}
+            )
+        except DuplicateKeyError:
+            pass
+
+    @staticmethod
+    def mark_pending(documents):
+        # Called before the history rows are inserted. Users without stats
+        # get the placeholder, so the mark always has a document to sit on.
+        operations = [
+            UpdateOne(
+                {"_id": user_id},
+                {"$setOnInsert": PLACEHOLDER, "$inc": {"pending": len(user_documents)}},
+                upsert=True
+            )
+            for user_id, user_documents in _by_user(documents).items()
+        ]
+        if operations:
+            get_db().user_stats.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def record_many(documents, marked=()):
+        # documents: the history rows that were stored; marked: the rows
+        # passed to mark_pending, stored or not, whose marks are cleared
+        by_user = _by_user(documents)
+        pending = {user_id: len(user_documents) for user_id, user_documents in _by_user(marked).items()}
+
+        operations = [
+            UpdateOne({"_id": user_id}, UserStats.build_update(by_user.get(user_id, []), pending.get(user_id, 0)))
+            for user_id in {**by_user, **pending}
+        ]
+        if operations:
+            get_db().user_stats.bulk_write(operations, ordered=False)
+
+    # Stats are best effort next to the history rows they summarize: the
+    # *_quietly variants log failures instead of raising
+    @staticmethod
+    def mark_pending_quietly(documents):
+        try:
+            UserStats.mark_pending(documents)
+            return True
+        except Exception as e:
+            print(f"Failed to mark user stats pending: {e}")
+            return False
+
+    @staticmethod
+    def record_many_quietly(documents, marked=()):
+        try:
+            UserStats.record_many(documents, marked)
+        except Exception as e:
+            print(f"Failed to update user stats: {e}")
+
+    @staticmethod
+    def get(user_id):
+        # Returns None when the user has no stats document yet (history
+        # from before stats were kept and not rebuilt); callers aggregate
+        stats = get_stats_reads().find_one({"_id": ObjectId(user_id)})
+        if stats is None or stats.get("rebuilding"):
+            return None
+
+        type_stats = [
+            {
+                "_id": _unescape_key(type_key),
+                "count": values.get("count", 0),
+                "last_accessed": values.get("last_accessed")
+            }
+            for type_key, values in stats.get("types", {}).items()
+        ]
+        genre_stats = sorted(
+            ({"_id": _unescape_key(genre), "count": count} for genre, count in stats.get("genres", {}).items()),
+            key=lambda g: g["count"],
+            reverse=True
+        )[:10]
+
+        return {
+            "type_stats": type_stats,
+            "genre_preferences": genre_stats,
+            "total_recommendations": stats.get("total", 0)
+        }
+
+    @staticmethod
+    def rebuild(user_ids=None, batch_size=500):
+        # Recomputes stats documents from raw history in bulk, a batch of
+        # users at a time so memory stays bounded. Returns the number of
+        # stats documents written.
+        db = get_db()
+        match = {"user_id": {"$in": [ObjectId(u) for u in user_ids]}} if user_ids else {}
+        user_cursor = db.history.aggregate(
+            [{"$match": match}, {"$group": {"_id": "$user_id"}}],
+            allowDiskUse=True
+        )
+
+        written = 0
+        batch = []
+        for row in user_cursor:
+            batch.append(row["_id"])
+            if len(batch) >= batch_size:
+                written += UserStats._rebuild_users(db, batch)
+                batch = []
+        if batch:
+            written += UserStats._rebuild_users(db, batch)
+        return written
+
+    @staticmethod
+    def _rebuild_users(db, user_ids):
+        written = 0
+        for _ in range(REBUILD_ATTEMPTS):
+            done, user_ids = UserStats._rebuild_batch(db, user_ids)
+            written += done
+            if not user_ids:
+                break
+        if user_ids:
+            print(f"Skipped stats rebuild for {len(user_ids)} users with concurrent writes")
+        return written
+
+    @staticmethod
+    def _rebuild_batch(db, user_ids):
+        # Returns (written, user_ids_to_retry). Users without a document get
+        # the placeholder first. Each document is then replaced only if no
+        # write is pending and its version is the one read before
+        # aggregating; otherwise the user is retried.
+        db.user_stats.bulk_write([
+            UpdateOne({"_id": user_id}, {"$setOnInsert": PLACEHOLDER}, upsert=True)
+            for user_id in user_ids
+        ], ordered=False)
+        versions = {
+            doc["_id"]: doc.get("version", 0)
+            for doc in db.user_stats.find({"_id": {"$in": user_ids}}, {"version": 1})
+        }
+
+        match = {"$match": {"user_id": {"$in": user_ids}}}
+        stats = {
+            user_id: {"_id": user_id, "total": 0, "types": {}, "genres": {}}
+            for user_id in user_ids
+        }
+
+        type_rows = db.history.aggregate([
+            match,
+            {"$group": {
+                "_id": {"user_id": "$user_id", "type": "$recommendation_type"},
+                "count": {"$sum": 1},
+                "last_accessed": {"$max": "$timestamp"}
+            }}
+        ], allowDiskUse=True)
+        for row in type_rows:
+            doc = stats[row["_id"]["user_id"]]
+            doc["types"][_escape_key(row["_id"].get("type"))] = {
+                "count": row["count"],
+                "last_accessed": row["last_accessed"]
+            }
+            doc["total"] += row["count"]
+
+        genre_rows = db.history.aggregate([
+            match,
+            {"$unwind": "$genre"},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "genre": "$genre"},
+                "count": {"$sum": 1}
+            }}
+        ], allowDiskUse=True)
+        for row in genre_rows:
+            genre = row["_id"].get("genre")
+            if genre is None or not str(genre).strip():
+                continue
+            stats[row["_id"]["user_id"]]["genres"][_escape_key(genre)] = row["count"]
+
+        rebuilt_at = datetime.now(timezone.utc)
+        written = 0
+        retry = []
+        for user_id, doc in stats.items():
+            doc["rebuilt_at"] = rebuilt_at
+            doc["version"] = versions.get(user_id, 0)
+            doc["pending"] = 0
+            result = db.user_stats.replace_one(
+                {"_id": user_id, "version": doc["version"], "pending": {"$in": [0, None]}}, doc
+            )
+            if result.matched_count:
+                written += 1
+            else:
+                retry.append(user_id)
+        return written, retry
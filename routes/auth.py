@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
+from pymongo.errors import DuplicateKeyError
 from models.user import User
 from utils.jwt_helper import generate_jwt
+from utils.auth import require_auth, revoke_token, revoke_user_tokens
+from utils.prefetch import prefetcher
+from utils.passwords import PasswordHasherBusy
+from utils.rate_limit import rate_limit
 import re
 
 auth_bp = Blueprint('auth', __name__)
@@ -12,7 +17,13 @@ def validate_email(email):
 def validate_password(password):
     return len(password) >= 6
 
+def hasher_busy_response(e):
+    response = jsonify({"error": e.message})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 503
+
 @auth_bp.route('/signup', methods=['POST'])
+@rate_limit("signup")
 def signup():
     try:
         data = request.get_json()
@@ -38,16 +49,25 @@ def signup():
         if not validate_password(password):
             return jsonify({"error": "Password must be at least 6 characters long"}), 400
         
-        # Check if user already exists
-        if User.find_by_email(email):
-            return jsonify({"error": "Email already registered"}), 409
-        
-        if User.find_by_username(username):
+        # Cheap check first so repeated signups don't occupy the hash
+        # workers; the unique indexes (made sure of by User.save) still
+        # catch concurrent duplicates
+        taken = User.taken_field(email, username)
+        if taken == "username":
             return jsonify({"error": "Username already taken"}), 409
-        
-        # Create new user
-        user = User(username=username, email=email, password=password, preferences=preferences)
-        user_id = user.save()
+        if taken == "email":
+            return jsonify({"error": "Email already registered"}), 409
+
+        try:
+            user = User(username=username, email=email, password=password, preferences=preferences)
+        except PasswordHasherBusy as e:
+            return hasher_busy_response(e)
+        try:
+            user_id = user.save()
+        except DuplicateKeyError as e:
+            if User.duplicate_field(e) == "username":
+                return jsonify({"error": "Username already taken"}), 409
+            return jsonify({"error": "Email already registered"}), 409
         
         # Generate JWT token
         token = generate_jwt(user_id, username, email)
@@ -68,6 +88,7 @@ def signup():
         return jsonify({"error": "Internal server error"}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit("login")
 def login():
     try:
         data = request.get_json()
@@ -83,11 +104,17 @@ def login():
         
         # Find user by email
         user = User.find_by_email(email)
-        if not user or not user.check_password(password):
-            return jsonify({"error": "Invalid email or password"}), 401
+        try:
+            if not user or not user.check_password(password):
+                return jsonify({"error": "Invalid email or password"}), 401
+        except PasswordHasherBusy as e:
+            return hasher_busy_response(e)
         
         # Update last login
         user.update_last_login()
+
+        # Warm the cache for the recommendations the user will likely ask for next
+        prefetcher.prefetch_for_user(user._id, user.preferences)
         
         # Generate JWT token
         token = generate_jwt(user._id, user.username, user.email)
@@ -107,3 +134,21 @@ def login():
     except Exception as e:
         print(f"Login error: {e}")
         return jsonify({"error": "Internal server error"}), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+@require_auth
+def logout():
+    try:
+        data = request.get_json(silent=True) or {}
+
+        # "all": true signs the user out of every session, not just this token
+        if data.get('all'):
+            revoke_user_tokens(g.user_id)
+        else:
+            revoke_token(g.token)
+
+        return jsonify({"message": "Logout successful"}), 200
+
+    except Exception as e:
+        print(f"Logout error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
@@ -1,57 +1,59 @@
-from flask import Blueprint, request, jsonify
-from utils.jwt_helper import decode_jwt
-from models.history import History
+import zlib
+from datetime import datetime, timezone
+from bson import ObjectId
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
+from utils.auth import require_auth
+from models.history import History, InvalidCursorError
+from utils.serializer import json_response, dumps
 
 history_bp = Blueprint('history', __name__)
 
+EXPORT_BATCH_SIZE = 500
+
 @history_bp.route('/history', methods=['GET'])
+@require_auth
 def get_history():
     try:
-        # JWT Authentication
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Missing or invalid Authorization header"}), 401
-
-        token = auth_header.split(" ")[1]
-        try:
-            user_data = decode_jwt(token)
-            user_id = user_data.get("user_id")
-        except Exception as e:
-            return jsonify({"error": "Invalid or expired token"}), 401
+        user_id = g.user_id
 
         # Get query parameters
         limit = min(int(request.args.get('limit', 20)), 100)  # Max 100 items
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
+        view = request.args.get('view', 'full')
+        item_count = request.args.get('item_count', 'true').lower() != 'false'
 
-        # Get user history
-        history = History.get_user_history(user_id, limit=limit, offset=offset)
+        if view not in ('full', 'summary'):
+            return jsonify({"error": "'view' must be 'full' or 'summary'"}), 400
 
-        return jsonify({
+        # Get user history; cursor (keyset) paging takes precedence over offset
+        try:
+            history, next_cursor = History.get_user_history_page(
+                user_id, limit=limit, cursor=cursor, offset=offset,
+                summary=view == 'summary', item_count=item_count
+            )
+        except InvalidCursorError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        return json_response({
             "status": "success",
             "history": history,
             "count": len(history),
             "limit": limit,
-            "offset": offset
-        }), 200
+            "offset": 0 if cursor else offset,
+            "next_cursor": next_cursor,
+            "view": view
+        })
 
     except Exception as e:
         print(f"History error: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 @history_bp.route('/history/stats', methods=['GET'])
+@require_auth
 def get_history_stats():
     try:
-        # JWT Authentication
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Missing or invalid Authorization header"}), 401
-
-        token = auth_header.split(" ")[1]
-        try:
-            user_data = decode_jwt(token)
-            user_id = user_data.get("user_id")
-        except Exception as e:
-            return jsonify({"error": "Invalid or expired token"}), 401
+        user_id = g.user_id
 
         # Get user stats
         stats = History.get_user_stats(user_id)
@@ -64,3 +66,97 @@ def get_history_stats():
     except Exception as e:
         print(f"Stats error: {e}")
         return jsonify({"error": "Internal server error"}), 500
+
+@history_bp.route('/history/export', methods=['GET'])
+@require_auth
+def export_history():
+    try:
+        user_id = g.user_id
+
+        # Resume point: ISO timestamp of the last row received, plus its _id
+        since = request.args.get('since')
+        after_id = request.args.get('after_id')
+        use_gzip = request.args.get('gzip', 'false').lower() == 'true'
+
+        if since:
+            try:
+                since = datetime.fromisoformat(since.replace("Z", "+00:00"))
+            except ValueError:
+                return jsonify({"error": "'since' must be an ISO 8601 timestamp"}), 400
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+        else:
+            since = None
+
+        if after_id and (since is None or not ObjectId.is_valid(after_id)):
+            return jsonify({"error": "'after_id' must be a valid id and needs 'since'"}), 400
+
+        cursor = History.iter_user_history(user_id, since=since, after_id=after_id, batch_size=EXPORT_BATCH_SIZE)
+
+        # One row per line; rows are buffered per batch so memory stays flat
+        # no matter how long the history is. If reading fails midway, the
+        # rows already read are sent, then a final
+        #   {"error": ..., "resume": {"since": ..., "after_id": ...}}
+        # line (completing the gzip stream), and the response is aborted so
+        # the transfer itself is incomplete too.
+        def generate():
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+            buffer = []
+            last_row = None
+            try:
+                for row in cursor:
+                    buffer.append(dumps(row))
+                    last_row = row
+                    if len(buffer) >= EXPORT_BATCH_SIZE:
+                        chunk = b"\n".join(buffer) + b"\n"
+                        buffer = []
+                        if compressor:
+                            chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                        yield chunk
+            except Exception as e:
+                print(f"History export error: {e}")
+                trailer = {"error": "Export interrupted"}
+                if last_row is not None:
+                    trailer["resume"] = {"since": last_row["timestamp"], "after_id": last_row["_id"]}
+                buffer.append(dumps(trailer))
+                chunk = b"\n".join(buffer) + b"\n"
+                if compressor:
+                    chunk = compressor.compress(chunk) + compressor.flush()
+                yield chunk
+                raise
+            finally:
+                cursor.close()
+
+            chunk = b"\n".join(buffer) + b"\n" if buffer else b""
+            if compressor:
+                chunk = compressor.compress(chunk) + compressor.flush()
+            if chunk:
+                yield chunk
+
+        # ?gzip=true asks for a .gz file, not a transfer encoding, so clients
+        # save the compressed bytes as they are
+        mimetype = "application/gzip" if use_gzip else "application/x-ndjson"
+        response = Response(stream_with_context(generate()), mimetype=mimetype)
+        response.headers["Content-Disposition"] = "attachment; filename=history.ndjson" + (".gz" if use_gzip else "")
+        return response
+
+    except Exception as e:
+        print(f"History export error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@history_bp.route('/history/<history_id>', methods=['GET'])
+@require_auth
+def get_history_entry(history_id):
+    try:
+        entry = History.get_user_history_entry(g.user_id, history_id)
+        if not entry:
+            return jsonify({"error": "History entry not found"}), 404
+
+        return json_response({
+            "status": "success",
+            "entry": entry
+        })
+
+    except Exception as e:
+        print(f"History entry error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
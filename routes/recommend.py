@@ -1,322 +1,116 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 import requests
-import os
-from dotenv import load_dotenv
-from utils.jwt_helper import decode_jwt
-from models.history import History
-
-load_dotenv()
+from utils.auth import require_auth, token_cache, AuthError
+from utils.http_client import get_upstream_stats
+from utils.cache import recommendation_cache
+from utils.history_writer import history_writer
+from utils.fallback_index import fallback_index
+from utils.personalization import personalizer
+from utils.prefetch import prefetcher
+from utils.passwords import password_hasher
+from utils.rate_limit import rate_limit, rate_limiter
+from utils.metrics import internal_only
+from utils.recommender import (
+    recommend_pipeline, fetch_pipeline, RecommendContext, save_recommendation_history, upstream_flight,
+    RecommendRequestError, UpstreamError, fetch_feed, interleave_items, parse_feed_payload
+)
 
 recommend_bp = Blueprint('recommend', __name__)
 
-RECOMMENDER_ENDPOINTS = {
-    "movie": os.getenv("MOVIE_RECOMMENDER_URL"),
-    "book": os.getenv("BOOK_RECOMMENDER_URL"),
-    "tv": os.getenv("TV_RECOMMENDER_URL")
-}
-
-RESPONSE_KEYS = {
-    "movie": "movies",
-    "book": "books",
-    "tv": "shows"
-}
-
-@recommend_bp.route('/recommend/tvshowrec', methods=['POST'])
-def recommend_tv():
+# The three type endpoints run the same pipeline; the request's 'type'
+# selects the recommender descriptor
+def run_recommend_pipeline():
     try:
-        data = request.get_json()
-
-        if not data:
-            return jsonify({"error": "No data provided"}), 400
-
-        rec_type = data.get('type')
-        genre = data.get('genre')
-        top_k = data.get('top_k', 10)
-
-        if not rec_type or not genre:
-            return jsonify({"error": "Missing 'type' or 'genre'"}), 400
-
-        if rec_type not in RECOMMENDER_ENDPOINTS or not RECOMMENDER_ENDPOINTS[rec_type]:
-            return jsonify({"error": "Invalid or missing recommender URL for type."}), 400
-
-        # JWT Authentication
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Missing or invalid Authorization header"}), 401
-
-        token = auth_header.split(" ")[1]
-        try:
-            user_data = decode_jwt(token)
-            user_id = user_data.get("user_id")
-        except Exception as e:
-            return jsonify({"error": "Invalid or expired token"}), 401
-
-        # Process genres
-        genres_list = [g.strip() for g in genre.split(",")] if isinstance(genre, str) else genre
-
-        # Call microservice
+        context = RecommendContext(request.get_json(), request.headers.get('Authorization'))
         try:
-            recommender_url = RECOMMENDER_ENDPOINTS[rec_type]
-            response = requests.post(
-                recommender_url,
-                json={"genres": genres_list},
-                timeout=10
-            )
-
-            if not response.ok:
-                return jsonify({
-                    "error": f"{rec_type} service error", 
-                    "details": response.text,
-                    "status_code": response.status_code
-                }), 500
-
-            result = response.json()
-            if result.get("status") != "success":
-                return jsonify({"error": result.get("message", "Unknown error")}), 500
-
-            raw_items = result.get(RESPONSE_KEYS.get(rec_type, "items"), [])
-
-            # Normalize response format
-            normalized = []
-            for item in raw_items:
-                normalized.append({
-                    "type": rec_type,
-                    "name": item.get("name") or item.get("title"),  
-                    "creator": item.get("director") or item.get("author") or item.get("creator"),
-                    "description": item.get("description", ""),
-                    "genre": item.get("genre", []),
-                    "rating": item.get("rating"),
-                    "year": item.get("year"),
-                    "image_url": item.get("image_url")
-                })
-
-            # Save to history
-            try:
-                history = History(
-                    user_id=user_id,
-                    recommendation_type=rec_type,
-                    genre=genres_list,
-                    items=normalized,
-                    query_params={"top_k": top_k}
-                )
-                history.save()
-                print(f"Saved recommendation history for user {user_id}")
-            except Exception as e:
-                print(f"Failed to save history: {e}")
-                # Don't fail the request if history saving fails
-
-            return jsonify({
-                "status": "success",
-                "recommendations": normalized,
-                "count": len(normalized),
-                "type": rec_type,
-                "genres": genres_list
-            }), 200
-
+            recommend_pipeline.run(context)
+            return context.response, 200
+        except RecommendRequestError as e:
+            return jsonify({"error": e.message}), e.status_code
+        except AuthError as e:
+            return jsonify({"error": str(e)}), 401
+        except UpstreamError as e:
+            return jsonify(e.payload), e.status_code
         except requests.exceptions.Timeout:
-            return jsonify({"error": f"{rec_type} service timeout"}), 504
+            return jsonify({"error": f"{context.rec_type} service timeout"}), 504
         except requests.exceptions.RequestException as e:
-            return jsonify({"error": f"Failed to connect to {rec_type} service", "details": str(e)}), 503
+            return jsonify({"error": f"Failed to connect to {context.rec_type} service", "details": str(e)}), 503
 
     except Exception as e:
         print(f"Recommend error: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@recommend_bp.route('/recommend/tvshowrec', methods=['POST'])
+@rate_limit("recommend")
+def recommend_tv():
+    return run_recommend_pipeline()
+
 @recommend_bp.route('/recommend/movies', methods=['POST'])
+@rate_limit("recommend")
 def recommend_movie():
-    try:
-        data = request.get_json()
-
-        if not data:
-            return jsonify({"error": "No data provided"}), 400
-
-        rec_type = data.get('type')
-        genre = data.get('genre')
-        top_k = data.get('top_k', 10)
-
-        if not rec_type or not genre:
-            return jsonify({"error": "Missing 'type' or 'genre'"}), 400
-
-        if rec_type not in RECOMMENDER_ENDPOINTS or not RECOMMENDER_ENDPOINTS[rec_type]:
-            return jsonify({"error": "Invalid or missing recommender URL for type."}), 400
-
-        # JWT Authentication
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Missing or invalid Authorization header"}), 401
-
-        token = auth_header.split(" ")[1]
-        try:
-            user_data = decode_jwt(token)
-            user_id = user_data.get("user_id")
-        except Exception as e:
-            return jsonify({"error": "Invalid or expired token"}), 401
-
-        # Process genres
-        genres_list = [g.strip() for g in genre.split(",")] if isinstance(genre, str) else genre
-
-        # Call microservice
-        try:
-            recommender_url = RECOMMENDER_ENDPOINTS[rec_type]
-            response = requests.post(
-                recommender_url,
-                json={"genres": genres_list, "top_k": top_k},
-                timeout=10
-            )
-
-            if not response.ok:
-                return jsonify({
-                    "error": f"{rec_type} service error", 
-                    "details": response.text,
-                    "status_code": response.status_code
-                }), 500
-
-            result = response.json()
-            if result.get("status") != "success":
-                return jsonify({"error": result.get("message", "Unknown error")}), 500
-
-            raw_items = result.get(RESPONSE_KEYS.get(rec_type, "items"), [])
-
-            # Normalize response format
-            normalized = []
-            for item in raw_items:
-                normalized.append({
-                    "type": rec_type,
-                    "name": item.get("name") or item.get("title"),  
-                    "creator": item.get("director") or item.get("author") or item.get("creator"),
-                    "description": item.get("description", ""),
-                    "genre": item.get("genre", []),
-                    "rating": item.get("rating")
-                })
-
-            # Save to history
-            try:
-                history = History(
-                    user_id=user_id,
-                    recommendation_type=rec_type,
-                    genre=genres_list,
-                    items=normalized,
-                    query_params={"top_k": top_k}
-                )
-                history.save()
-                print(f"Saved recommendation history for user {user_id}")
-            except Exception as e:
-                print(f"Failed to save history: {e}")
-                # Don't fail the request if history saving fails
-
-            return jsonify({
-                "status": "success",
-                "recommendations": normalized,
-                "count": len(normalized),
-                "type": rec_type,
-                "genres": genres_list
-            }), 200
-
-        except requests.exceptions.Timeout:
-            return jsonify({"error": f"{rec_type} service timeout"}), 504
-        except requests.exceptions.RequestException as e:
-            return jsonify({"error": f"Failed to connect to {rec_type} service", "details": str(e)}), 503
-
-    except Exception as e:
-        print(f"Recommend error: {e}")
-        return jsonify({"error": "Internal server error"}), 500
-
+    return run_recommend_pipeline()
 
 @recommend_bp.route('/recommend/book', methods=['POST'])
+@rate_limit("recommend")
 def recommend_book():
-    try:
-        data = request.get_json()
-
-        if not data:
-            return jsonify({"error": "No data provided"}), 400
-
-        rec_type = data.get('type')
-        genre = data.get('genre')
-        top_k = data.get('top_k', 10)
-
-        if not rec_type or not genre:
-            return jsonify({"error": "Missing 'type' or 'genre'"}), 400
+    return run_recommend_pipeline()
 
-        if rec_type not in RECOMMENDER_ENDPOINTS or not RECOMMENDER_ENDPOINTS[rec_type]:
-            return jsonify({"error": "Invalid or missing recommender URL for type."}), 400
-
-        # JWT Authentication
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Missing or invalid Authorization header"}), 401
-
-        token = auth_header.split(" ")[1]
-        try:
-            user_data = decode_jwt(token)
-            user_id = user_data.get("user_id")
-        except Exception as e:
-            return jsonify({"error": "Invalid or expired token"}), 401
-
-        # Process genres
-        genres_list = [g.strip() for g in genre.split(",")] if isinstance(genre, str) else genre
-
-        # Call microservice
+@recommend_bp.route('/recommend/feed', methods=['POST'])
+@rate_limit("feed")
+@require_auth
+def recommend_feed():
+    try:
         try:
-            recommender_url = RECOMMENDER_ENDPOINTS[rec_type]
-            response = requests.post(
-                recommender_url,
-                json={"genres": genres_list, "top_k": top_k},
-                timeout=10
-            )
-
-            if not response.ok:
-                return jsonify({
-                    "error": f"{rec_type} service error", 
-                    "details": response.text,
-                    "status_code": response.status_code
-                }), 500
-
-            result = response.json()
-            if result.get("status") != "success":
-                return jsonify({"error": result.get("message", "Unknown error")}), 500
-
-            raw_items = result.get(RESPONSE_KEYS.get(rec_type, "items"), [])
-
-            # Normalize response format
-            normalized = []
-            for item in raw_items:
-                normalized.append({
-                    "type": rec_type,
-                    "name": item.get("name") or item.get("title"),  
-                    "creator": item.get("director") or item.get("author") or item.get("creator"),
-                    "description": item.get("description", ""),
-                    "genre": item.get("genre", []),
-                    "rating": item.get("rating")
-                })
-
-            # Save to history
-            try:
-                history = History(
-                    user_id=user_id,
-                    recommendation_type=rec_type,
-                    genre=genres_list,
-                    items=normalized,
-                    query_params={"top_k": top_k}
-                )
-                history.save()
-                print(f"Saved recommendation history for user {user_id}")
-            except Exception as e:
-                print(f"Failed to save history: {e}")
-                # Don't fail the request if history saving fails
-
-            return jsonify({
-                "status": "success",
-                "recommendations": normalized,
-                "count": len(normalized),
-                "type": rec_type,
-                "genres": genres_list
-            }), 200
-
-        except requests.exceptions.Timeout:
-            return jsonify({"error": f"{rec_type} service timeout"}), 504
-        except requests.exceptions.RequestException as e:
-            return jsonify({"error": f"Failed to connect to {rec_type} service", "details": str(e)}), 503
+            types, genres_list, top_k, layout, deadline_ms = parse_feed_payload(request.get_json())
+        except RecommendRequestError as e:
+            return jsonify({"error": e.message}), e.status_code
+
+        user_id = g.user_id
+
+        results, type_status = fetch_feed(types, genres_list, top_k, deadline_ms)
+        if not results:
+            return jsonify({"error": "All recommender services failed", "types": type_status}), 503
+
+        all_items = interleave_items(results, types)
+        save_recommendation_history(
+            user_id, "mixed", genres_list, all_items,
+            {"top_k": top_k, "types": types, "layout": layout}
+        )
+
+        response = {
+            "status": "success" if all(t["status"] == "success" for t in type_status.values()) else "partial",
+            "layout": layout,
+            "types": type_status,
+            "count": len(all_items),
+            "genres": genres_list
+        }
+        if layout == "group":
+            response["recommendations"] = {rec_type: results[rec_type] for rec_type in types if rec_type in results}
+        else:
+            response["recommendations"] = all_items
+
+        return jsonify(response), 200
 
     except Exception as e:
-        print(f"Recommend error: {e}")
+        print(f"Feed error: {e}")
         return jsonify({"error": "Internal server error"}), 500
+
+# Replica URLs and in-flight keys: internal callers only (see metrics)
+@recommend_bp.route('/recommend/stats', methods=['GET'])
+@internal_only
+def recommend_stats():
+    return jsonify({
+        "status": "success",
+        "upstream": get_upstream_stats(),
+        "cache": recommendation_cache.info(),
+        "single_flight": upstream_flight.stats(),
+        "pipeline": recommend_pipeline.stats(),
+        "fetch_pipeline": fetch_pipeline.stats(),
+        "fallback_index": fallback_index.stats(),
+        "personalization": personalizer.stats(),
+        "prefetch": prefetcher.stats(),
+        "password_hasher": password_hasher.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "history_writer": history_writer.stats(),
+        "token_cache": token_cache.stats()
+    }), 200
@@ -1,23 +1,15 @@
-from flask import Blueprint, request, jsonify
-from utils.jwt_helper import decode_jwt
+from flask import Blueprint, request, jsonify, g
+from utils.auth import require_auth
 from models.user import User
+from utils.personalization import personalizer
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/profile', methods=['GET'])
+@require_auth
 def get_profile():
     try:
-        # JWT Authentication
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Missing or invalid Authorization header"}), 401
-
-        token = auth_header.split(" ")[1]
-        try:
-            user_data = decode_jwt(token)
-            user_id = user_data.get("user_id")
-        except Exception as e:
-            return jsonify({"error": "Invalid or expired token"}), 401
+        user_id = g.user_id
 
         # Get user profile
         user = User.find_by_id(user_id)
@@ -41,19 +33,10 @@ def get_profile():
         return jsonify({"error": "Internal server error"}), 500
 
 @user_bp.route('/preferences', methods=['PUT'])
+@require_auth
 def update_preferences():
     try:
-        # JWT Authentication
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Missing or invalid Authorization header"}), 401
-
-        token = auth_header.split(" ")[1]
-        try:
-            user_data = decode_jwt(token)
-            user_id = user_data.get("user_id")
-        except Exception as e:
-            return jsonify({"error": "Invalid or expired token"}), 401
+        user_id = g.user_id
 
         data = request.get_json()
         if not data:
@@ -65,11 +48,9 @@ def update_preferences():
             return jsonify({"error": "Valid preferences object is required"}), 400
 
         # Update user preferences
-        user = User.find_by_id(user_id)
-        if not user:
+        if User.set_preferences(user_id, preferences) is None:
             return jsonify({"error": "User not found"}), 404
-
-        user.update_preferences(preferences)
+        personalizer.invalidate(user_id)
 
         return jsonify({
             "status": "success",
@@ -0,0 +1,125 @@
+import asyncio
+import time
+import httpx
+from config.recommenders import (
+    POOL_SIZE, KEEP_ALIVE, CONNECT_TIMEOUT, READ_TIMEOUT
+)
+from config.history import HISTORY_WRITE_MODE, HISTORY_QUEUE_POLICY
+from utils.cache import recommendation_cache, stale_results
+from utils.fallback_index import fallback_index
+from utils.resilience import get_upstream_guard, CircuitOpenError
+from utils.load_balancer import get_replica_pool
+from utils.singleflight import AsyncSingleFlight
+from utils.metrics import record_upstream
+from utils.recommender import (
+    RECOMMENDER_TYPES, degraded_result, parse_upstream_response, save_recommendation_history, UpstreamError
+)
+
+async_upstream_flight = AsyncSingleFlight()
+
+async def off_loop(blocking, fn, *args):
+    # In-process backends are called directly; network ones (Redis) run on
+    # a worker thread so a slow round trip never stalls the event loop
+    if blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+_clients = {}
+
+def get_async_upstream_client(rec_type):
+    client = _clients.get(rec_type)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE,
+                max_keepalive_connections=POOL_SIZE if KEEP_ALIVE else 0
+            ),
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+        )
+        _clients[rec_type] = client
+    return client
+
+async def close_async_upstream_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+async def call_recommender_async(descriptor, genres_list, top_k):
+    # Same circuit breaker and adaptive read timeout as the sync client
+    rec_type = descriptor.name
+    guard = get_upstream_guard(rec_type)
+    if not guard.breaker.allow():
+        record_upstream(rec_type, "circuit_open")
+        raise CircuitOpenError(f"{rec_type} recommender circuit is open")
+
+    client = get_async_upstream_client(rec_type)
+    replicas = get_replica_pool(rec_type)
+    read_timeout = guard.read_timeout(READ_TIMEOUT)
+    timeout = httpx.Timeout(read_timeout, connect=CONNECT_TIMEOUT)
+    replica = replicas.acquire()
+    start = time.perf_counter()
+    try:
+        response = await client.post(replica.url, json=descriptor.upstream_payload(genres_list, top_k), timeout=timeout)
+    except Exception as e:
+        replicas.release(replica, failed=True)
+        guard.breaker.record_failure()
+        if isinstance(e, httpx.ReadTimeout):
+            guard.latency.record_timeout(read_timeout)
+        outcome = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+        record_upstream(rec_type, outcome, time.perf_counter() - start)
+        raise
+    except BaseException:
+        # Cancelled (client gone, fan-out deadline): give the replica slot
+        # back and free the half-open probe without blaming the upstream
+        replicas.release(replica)
+        guard.breaker.record_abandoned()
+        raise
+
+    elapsed = time.perf_counter() - start
+    replicas.release(replica, latency=elapsed, failed=response.status_code >= 500)
+    record_upstream(rec_type, response.status_code, elapsed)
+
+    if response.status_code >= 500:
+        guard.breaker.record_failure()
+    else:
+        guard.breaker.record_success()
+        guard.latency.record(elapsed)
+
+    return parse_upstream_response(descriptor, response.status_code, response.text, response.json)
+
+# Async counterpart of utils.recommender.fetch_recommendations; httpx
+# exceptions from the upstream call are left to the caller.
+async def fetch_recommendations_async(rec_type, genres_list, top_k):
+    descriptor = RECOMMENDER_TYPES[rec_type]
+    cache_key = descriptor.cache_key(genres_list, top_k)
+
+    cached = await off_loop(recommendation_cache.blocking, recommendation_cache.get, cache_key)
+    if cached is not None:
+        return cached, "cache"
+
+    fallback_index.start()
+
+    async def load():
+        raw_items = await call_recommender_async(descriptor, genres_list, top_k)
+        normalized = descriptor.normalize(raw_items)
+        await off_loop(recommendation_cache.blocking, recommendation_cache.set, cache_key, normalized)
+        stale_results.set(cache_key, normalized)
+        return normalized
+
+    try:
+        normalized, _ = await async_upstream_flight.do(cache_key, load)
+    except (httpx.HTTPError, CircuitOpenError, UpstreamError):
+        items, source = degraded_result(rec_type, cache_key, genres_list, top_k)
+        if items is None:
+            raise
+        return items, source
+    return normalized, "upstream"
+
+async def save_recommendation_history_async(user_id, rec_type, genres_list, items, query_params):
+    # Enqueueing with the drop policy never blocks; anything that can wait
+    # (block policy, sync writes) is moved off the event loop.
+    if HISTORY_WRITE_MODE == "async" and HISTORY_QUEUE_POLICY == "drop":
+        save_recommendation_history(user_id, rec_type, genres_list, items, query_params)
+    else:
+        await asyncio.to_thread(save_recommendation_history, user_id, rec_type, genres_list, items, query_params)
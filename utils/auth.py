@@ -0,0 +1,210 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify, g
+from config.auth import TOKEN_CACHE_SIZE, TOKEN_LIFETIME, TOKEN_REVOCATION_BACKEND
+from config.recommenders import REDIS_URL, REDIS_SOCKET_TIMEOUT, REDIS_CONNECT_TIMEOUT
+from utils.jwt_helper import decode_jwt
+
+class AuthError(Exception):
+    pass
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).digest()
+
+# Bounded cache of verified JWT payloads keyed by the token's digest. Each
+# entry expires at the token's own `exp`, and revoked tokens are remembered
+# until they would have expired anyway so a logout cannot be undone by a
+# fresh decode. Revocations live in this process only unless a shared
+# store is given; under several workers a logout then reaches the others
+# through it.
+class TokenCache:
+    def __init__(self, max_entries=TOKEN_CACHE_SIZE, shared=None, token_lifetime=TOKEN_LIFETIME):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.token_lifetime = token_lifetime
+        self._entries = OrderedDict()
+        self._revoked = {}
+        # user_id -> whole second of "logout all"; JWT iat has second
+        # resolution, so tokens issued in that second stay valid
+        self._revoked_users = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def blocking(self):
+        # Lookups wait on Redis when revocations are shared
+        return self.shared is not None
+
+    def get(self, digest, now=None):
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return payload
+
+    def put(self, digest, payload):
+        expires_at = payload.get("exp")
+        if not expires_at:
+            return
+        with self._lock:
+            self._entries[digest] = (expires_at, payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, digest, payload=None):
+        if digest in self._revoked:
+            return True
+        user_id = payload.get("user_id") if payload is not None else None
+        revoked_at = self._revoked_users.get(user_id)
+        if self.shared is not None:
+            token_revoked, shared_revoked_at = self.shared.check(digest, user_id)
+            if token_revoked:
+                return True
+            if shared_revoked_at is not None and (revoked_at is None or shared_revoked_at > revoked_at):
+                revoked_at = shared_revoked_at
+        return revoked_at is not None and payload is not None and payload.get("iat", 0) < revoked_at
+
+    def revoke(self, digest, expires_at):
+        with self._lock:
+            self._entries.pop(digest, None)
+            self._revoked[digest] = expires_at
+            self._prune_revoked()
+        if self.shared is not None:
+            self.shared.revoke(digest, expires_at)
+
+    def revoke_user(self, user_id, revoked_at=None):
+        # Invalidates every token issued to the user before this second
+        revoked_at = int(revoked_at or time.time())
+        with self._lock:
+            self._revoked_users[user_id] = revoked_at
+            for digest in [d for d, (_, p) in self._entries.items() if p.get("user_id") == user_id]:
+                del self._entries[digest]
+            self._prune_revoked()
+        if self.shared is not None:
+            self.shared.revoke_user(user_id, revoked_at, self.token_lifetime)
+
+    def _prune_revoked(self):
+        # Tokens revoked one by one are kept until their exp; a "logout
+        # all" until every token it covered has expired
+        now = time.time()
+        for digest in [d for d, exp in self._revoked.items() if exp <= now]:
+            del self._revoked[digest]
+        horizon = now - self.token_lifetime
+        for user_id in [u for u, at in self._revoked_users.items() if at <= horizon]:
+            del self._revoked_users[user_id]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "revoked": len(self._revoked),
+            "revoked_users": len(self._revoked_users),
+            "revocation_backend": "redis" if self.shared is not None else "memory"
+        }
+
+# Revocations shared by every worker. Keys expire with the tokens they
+# cover. If Redis cannot be reached the check passes (only this process's
+# own revocations apply) rather than rejecting every request.
+class RedisRevocations:
+    def __init__(self, url=REDIS_URL, socket_timeout=REDIS_SOCKET_TIMEOUT, connect_timeout=REDIS_CONNECT_TIMEOUT):
+        import redis
+
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=socket_timeout, socket_connect_timeout=connect_timeout
+        )
+        self.errors = 0
+
+    def check(self, digest, user_id):
+        keys = [f"revoked:token:{digest.hex()}", f"revoked:user:{user_id}"]
+        try:
+            token_revoked, revoked_at = self.client.mget(keys)
+        except Exception as e:
+            self.errors += 1
+            print(f"Revocation check failed: {e}")
+            return False, None
+        return token_revoked is not None, int(revoked_at) if revoked_at is not None else None
+
+    def revoke(self, digest, expires_at):
+        try:
+            self.client.set(f"revoked:token:{digest.hex()}", 1, exat=int(expires_at) + 1)
+        except Exception as e:
+            self.errors += 1
+            print(f"Failed to share token revocation: {e}")
+
+    def revoke_user(self, user_id, revoked_at, lifetime):
+        try:
+            self.client.set(f"revoked:user:{user_id}", revoked_at, ex=lifetime)
+        except Exception as e:
+            self.errors += 1
+            print(f"Failed to share user revocation: {e}")
+
+token_cache = TokenCache(shared=RedisRevocations() if TOKEN_REVOCATION_BACKEND == "redis" else None)
+
+def authenticate_token(token):
+    digest = token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is None:
+        try:
+            payload = decode_jwt(token)
+        except Exception:
+            raise AuthError("Invalid or expired token")
+        if token_cache.is_revoked(digest, payload):
+            raise AuthError("Invalid or expired token")
+        token_cache.put(digest, payload)
+    elif token_cache.is_revoked(digest, payload):
+        raise AuthError("Invalid or expired token")
+    return payload
+
+def get_token_from_header(auth_header):
+    if not auth_header or not auth_header.startswith('Bearer '):
+        raise AuthError("Missing or invalid Authorization header")
+    return auth_header.split(" ")[1]
+
+def get_user_id_from_header(auth_header):
+    return authenticate_token(get_token_from_header(auth_header)).get("user_id")
+
+# Revocation hooks, called on logout
+def revoke_token(token):
+    try:
+        payload = authenticate_token(token)
+    except AuthError:
+        return
+    token_cache.revoke(token_digest(token), payload.get("exp", time.time()))
+
+def revoke_user_tokens(user_id):
+    token_cache.revoke_user(user_id)
+
+# Puts the verified token on flask.g (user_id, user_data, token) or returns
+# the same 401 responses the handlers used to build themselves
+def require_auth(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        try:
+            token = get_token_from_header(request.headers.get('Authorization'))
+            user_data = authenticate_token(token)
+        except AuthError as e:
+            return jsonify({"error": str(e)}), 401
+
+        g.token = token
+        g.user_data = user_data
+        g.user_id = user_data.get("user_id")
+        return f(*args, **kwargs)
+    return decorated
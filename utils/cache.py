@@ -0,0 +1,198 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from config.recommenders import (
+    CACHE_BACKEND, CACHE_TTL, CACHE_MAX_ENTRIES, REDIS_URL, REDIS_SOCKET_TIMEOUT, REDIS_CONNECT_TIMEOUT,
+    REDIS_RETRY_INTERVAL, STALE_RESULT_TTL
+)
+
+def normalize_genres(genres):
+    if isinstance(genres, str):
+        genres = genres.split(",")
+    normalized = {str(g).strip().lower() for g in genres or []}
+    normalized.discard("")
+    return sorted(normalized)
+
+def make_cache_key(rec_type, genres, top_k):
+    return f"rec:{rec_type}:{'|'.join(normalize_genres(genres))}:{top_k}"
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+
+    def to_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# In-process LRU cache with a per-entry TTL
+class MemoryCache:
+    backend = "memory"
+    blocking = False  # True when calls wait on the network
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.stats.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            self.stats.sets += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def info(self):
+        info = self.stats.to_dict()
+        info.update({"backend": self.backend, "size": len(self._data), "max_entries": self.max_entries, "ttl": self.ttl})
+        return info
+
+# Shared cache for multi-worker deployments; LRU eviction is left to the
+# Redis server's maxmemory-policy (allkeys-lru). Calls are bounded by
+# short socket timeouts, and after an error the cache is skipped for
+# retry_interval seconds so an unreachable Redis is not waited on by
+# every request.
+class RedisCache:
+    backend = "redis"
+    blocking = True
+
+    def __init__(self, url=REDIS_URL, ttl=CACHE_TTL, socket_timeout=REDIS_SOCKET_TIMEOUT,
+                 connect_timeout=REDIS_CONNECT_TIMEOUT, retry_interval=REDIS_RETRY_INTERVAL):
+        import redis
+
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=socket_timeout, socket_connect_timeout=connect_timeout
+        )
+        self.retry_interval = retry_interval
+        self.down_until = 0.0
+        self.errors = 0
+        self.stats = CacheStats()
+
+    def _available(self):
+        return time.monotonic() >= self.down_until
+
+    def _failed(self, action, e):
+        self.errors += 1
+        self.down_until = time.monotonic() + self.retry_interval
+        print(f"Cache {action} failed: {e}")
+
+    def get(self, key):
+        raw = None
+        if self._available():
+            try:
+                raw = self.client.get(key)
+            except Exception as e:
+                self._failed("get", e)
+
+        if raw is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        if not self._available():
+            return
+        try:
+            self.client.set(key, json.dumps(value), ex=ttl if ttl is not None else self.ttl)
+            self.stats.sets += 1
+        except Exception as e:
+            self._failed("set", e)
+
+    def delete(self, key):
+        if not self._available():
+            return
+        try:
+            self.client.delete(key)
+        except Exception as e:
+            self._failed("delete", e)
+
+    def clear(self):
+        pass
+
+    def info(self):
+        info = self.stats.to_dict()
+        info.update({"backend": self.backend, "ttl": self.ttl, "errors": self.errors,
+                     "available": self._available()})
+        return info
+
+# Used when caching is switched off
+class NullCache:
+    backend = "none"
+    blocking = False
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key):
+        self.stats.misses += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def info(self):
+        info = self.stats.to_dict()
+        info["backend"] = self.backend
+        return info
+
+def create_cache(backend=CACHE_BACKEND):
+    if backend == "redis":
+        return RedisCache()
+    if backend == "none":
+        return NullCache()
+    return MemoryCache()
+
+recommendation_cache = create_cache()
+
+# Last good result per key, kept well past the cache TTL so a failing
+# upstream can still be answered
+stale_results = MemoryCache(ttl=STALE_RESULT_TTL)
@@ -0,0 +1,29 @@
+import os
+import threading
+
+# An executor created on first use, and again in a forked child: the copy a
+# child inherits has no worker threads or processes behind it. factory()
+# builds the executor; on_create() runs under the lock right after, for
+# owners whose bookkeeping of queued work has to start over with it. Pass
+# the owner's lock when that bookkeeping is guarded by it.
+class LazyExecutor:
+    def __init__(self, factory, on_create=None, lock=None):
+        self.factory = factory
+        self.on_create = on_create
+        self._lock = lock or threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def get(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = self.factory()
+                    self._pid = os.getpid()
+                    if self.on_create is not None:
+                        self.on_create()
+        return self._executor
+
+    def reset(self):
+        # The next get() builds a new executor (after this one broke)
+        self._executor = None
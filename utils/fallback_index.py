@@ -0,0 +1,295 @@
+import bisect
+import heapq
+import itertools
+import os
+import threading
+import time
+from datetime import timedelta
+from config.database import get_history_reads
+from config.recommenders import (
+    FALLBACK_ENABLED, FALLBACK_REFRESH_INTERVAL, FALLBACK_INITIAL_SCAN, FALLBACK_MAX_ITEMS,
+    FALLBACK_REREAD_WINDOW
+)
+from utils.cache import normalize_genres
+
+def _rating(item):
+    try:
+        return float(item.get("rating") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+# Immutable genre index for one recommender type. Every item is keyed by its
+# rank, (-rating, a counter bumped per added item), and each posting list
+# holds its items' ranks in ascending order, so it is already ranked by
+# rating and lists can be merged as they are. A refresh builds the next
+# index with updated(), which shares the posting lists of the genres no
+# changed item carries and splices the changes into the others.
+class GenreIndex:
+    __slots__ = ("items", "names", "postings", "members", "added", "memo")
+
+    MEMO_SIZE = 4096
+
+    def __init__(self, catalog=None):
+        self.items = {}
+        self.names = {}
+        self.postings = {}
+        # Rank sets for the intersection, built for multi-genre lookups
+        self.members = {}
+        self.added = 0
+        # The index never changes, so answers are memoized until it is
+        # replaced by the next refresh
+        self.memo = {}
+        if catalog:
+            self._apply(catalog, ())
+
+    def updated(self, upserts, removed):
+        # New index with the items in upserts (name -> item) added or
+        # replaced and the names in removed dropped
+        index = GenreIndex()
+        index.items = dict(self.items)
+        index.names = dict(self.names)
+        index.postings = dict(self.postings)
+        index.members = dict(self.members)
+        index.added = self.added
+        index._apply(upserts, removed)
+        return index
+
+    def _apply(self, upserts, removed):
+        dropped = {}
+        added = {}
+        for name in itertools.chain(removed, upserts):
+            rank = self.names.pop(name, None)
+            if rank is None:
+                continue
+            for genre in normalize_genres(self.items.pop(rank).get("genre")):
+                dropped.setdefault(genre, []).append(rank)
+
+        for name, item in upserts.items():
+            self.added += 1
+            rank = (-_rating(item), self.added)
+            self.names[name] = rank
+            self.items[rank] = item
+            for genre in normalize_genres(item.get("genre")):
+                added.setdefault(genre, []).append(rank)
+
+        for genre in dropped.keys() | added.keys():
+            ranks = list(self.postings.get(genre, ()))
+            for rank in dropped.get(genre, ()):
+                del ranks[bisect.bisect_left(ranks, rank)]
+            new_ranks = sorted(added.get(genre, ()))
+            if len(new_ranks) > len(ranks) // 8:
+                ranks.extend(new_ranks)
+                ranks.sort()
+            else:
+                for rank in new_ranks:
+                    bisect.insort(ranks, rank)
+
+            self.members.pop(genre, None)
+            if ranks:
+                self.postings[genre] = ranks
+            else:
+                self.postings.pop(genre, None)
+
+    def _members(self, genre):
+        # Built on the first multi-genre lookup after the genre changed
+        members = self.members.get(genre)
+        if members is None:
+            members = self.members[genre] = frozenset(self.postings[genre])
+        return members
+
+    def query(self, genres, top_k):
+        key = (tuple(genres), top_k)
+        result = self.memo.get(key)
+        if result is None:
+            result = self._query(genres, top_k)
+            if len(self.memo) >= self.MEMO_SIZE:
+                self.memo.clear()
+            self.memo[key] = result
+        return result
+
+    def _query(self, genres, top_k):
+        # Items carrying every requested genre first, best rated first; the
+        # rest of top_k is filled from items carrying any of them
+        lists = [self.postings.get(genre) for genre in genres]
+        lists = [ranks for ranks in lists if ranks]
+        if not lists:
+            return []
+
+        picked = []
+        if len(lists) == len(genres):
+            if len(lists) == 1:
+                picked = lists[0][:top_k]
+            else:
+                members = sorted((self._members(genre) for genre in genres), key=len)
+                picked = heapq.nsmallest(top_k, members[0].intersection(*members[1:]))
+
+        if len(picked) < top_k and (len(lists) > 1 or not picked):
+            seen = set(picked)
+            for rank in heapq.merge(*lists):
+                if rank in seen:
+                    continue
+                seen.add(rank)
+                picked.append(rank)
+                if len(picked) >= top_k:
+                    break
+
+        items = self.items
+        return [items[rank] for rank in picked]
+
+# Genre -> items index per recommender type, built from the normalized
+# items already stored in db.history. A daemon thread reads the rows
+# timestamped since its last pass, plus a re-read window for rows that
+# landed late, and swaps in an updated index, so lookups never wait on
+# Mongo or a lock. Rows already applied in the window are skipped by _id.
+class FallbackIndex:
+    def __init__(self, enabled=FALLBACK_ENABLED, refresh_interval=FALLBACK_REFRESH_INTERVAL,
+                 initial_scan=FALLBACK_INITIAL_SCAN, max_items=FALLBACK_MAX_ITEMS,
+                 reread_window=FALLBACK_REREAD_WINDOW):
+        self.enabled = enabled
+        self.refresh_interval = refresh_interval
+        self.initial_scan = initial_scan
+        self.max_items = max_items
+        self.reread_window = timedelta(seconds=reread_window)
+
+        self._catalogs = {}
+        self._indexes = {}
+        self._last_timestamp = None
+        self._window_ids = set()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+        self.builds = 0
+        self.rows_read = 0
+        self.last_build_ms = 0.0
+        self.last_refresh = None
+        self.queries = 0
+        self.hits = 0
+
+    def start(self):
+        # Started on first use and again in a forked child
+        if not self.enabled:
+            return
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="fallback-index", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Fallback index refresh failed: {e}")
+            time.sleep(self.refresh_interval)
+
+    def _read_rows(self):
+        # Oldest first, so newer copies of an item win
+        collection = get_history_reads()
+        projection = {"recommendation_type": 1, "items": 1, "timestamp": 1}
+        if self._last_timestamp is None:
+            # First pass: only the most recent rows
+            find = collection.find({}, projection).sort([("timestamp", -1), ("_id", -1)])
+            rows = list(find.limit(self.initial_scan))
+            rows.reverse()
+            return rows
+        query = {"timestamp": {"$gte": self._last_timestamp - self.reread_window}}
+        return list(collection.find(query, projection).sort([("timestamp", 1), ("_id", 1)]))
+
+    def _advance(self, rows):
+        # Remembers the rows inside the next pass's re-read window
+        timestamps = [row["timestamp"] for row in rows if row.get("timestamp") is not None]
+        if not timestamps:
+            return
+        self._last_timestamp = max(timestamps)
+        cutoff = self._last_timestamp - self.reread_window
+        self._window_ids = {
+            row["_id"] for row in rows if row.get("timestamp") is not None and row["timestamp"] >= cutoff
+        }
+
+    def refresh(self):
+        with self._refresh_lock:
+            fetched = self._read_rows()
+            rows = [row for row in fetched if row["_id"] not in self._window_ids]
+            self._advance(fetched)
+            if not rows:
+                return 0
+
+            start = time.perf_counter()
+            changes = {}
+            for row in rows:
+                for item in row.get("items") or []:
+                    rec_type = item.get("type") or row.get("recommendation_type")
+                    name = item.get("name")
+                    if not name or not item.get("genre"):
+                        continue
+                    catalog = self._catalogs.setdefault(rec_type, {})
+                    upserts, removed = changes.setdefault(rec_type, ({}, set()))
+                    catalog.pop(name, None)
+                    catalog[name] = item
+                    upserts[name] = item
+                    removed.discard(name)
+                    if len(catalog) > self.max_items:
+                        # Forget the least recently seen item
+                        evicted = next(iter(catalog))
+                        del catalog[evicted]
+                        upserts.pop(evicted, None)
+                        removed.add(evicted)
+
+            for rec_type, (upserts, removed) in changes.items():
+                index = self._indexes.get(rec_type)
+                if index is None:
+                    self._indexes[rec_type] = GenreIndex(self._catalogs[rec_type])
+                else:
+                    self._indexes[rec_type] = index.updated(upserts, removed)
+
+            self.rows_read += len(rows)
+            self.builds += 1
+            self.last_build_ms = round((time.perf_counter() - start) * 1000, 3)
+            self.last_refresh = time.time()
+            return len(rows)
+
+    def query(self, rec_type, genres_list, top_k):
+        # Returns up to top_k items, or None if the index has nothing for
+        # these genres (yet)
+        if not self.enabled:
+            return None
+        self.start()
+
+        self.queries += 1
+        index = self._indexes.get(rec_type)
+        if index is None:
+            return None
+        try:
+            top_k = int(top_k)
+        except (TypeError, ValueError):
+            top_k = 10
+
+        items = index.query(normalize_genres(genres_list), top_k)
+        if not items:
+            return None
+        self.hits += 1
+        return items
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "types": {
+                rec_type: {"items": len(index.items), "genres": len(index.postings)}
+                for rec_type, index in list(self._indexes.items())
+            },
+            "builds": self.builds,
+            "rows_read": self.rows_read,
+            "last_build_ms": self.last_build_ms,
+            "last_refresh": self.last_refresh,
+            "queries": self.queries,
+            "hits": self.hits
+        }
+
+fallback_index = FallbackIndex()
@@ -0,0 +1,159 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from pymongo.errors import BulkWriteError
+from config.database import get_history_writes
+from models.user_stats import UserStats
+from config.history import (
+    HISTORY_QUEUE_SIZE, HISTORY_BATCH_SIZE, HISTORY_FLUSH_INTERVAL,
+    HISTORY_QUEUE_POLICY, HISTORY_BLOCK_TIMEOUT, HISTORY_SHUTDOWN_TIMEOUT
+)
+
+_STOP = object()
+
+# Buffers history documents in a bounded queue and writes them to Mongo in
+# unordered insert_many batches from a daemon thread. The batch is flushed
+# when it reaches batch_size or when flush_interval has passed.
+class HistoryWriter:
+    def __init__(self, max_queue=HISTORY_QUEUE_SIZE, batch_size=HISTORY_BATCH_SIZE,
+                 flush_interval=HISTORY_FLUSH_INTERVAL, policy=HISTORY_QUEUE_POLICY,
+                 block_timeout=HISTORY_BLOCK_TIMEOUT):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown history queue policy '{policy}'")
+
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def _ensure_started(self):
+        # The worker is started lazily and restarted in a forked child, where
+        # the parent's thread does not exist.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, document):
+        # Returns False if the record was dropped because the queue is full
+        self._ensure_started()
+        try:
+            if self.policy == "block":
+                self._queue.put(document, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(document)
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+        self.enqueued += 1
+        return True
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(batch)
+                return
+
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, batch):
+        if not batch:
+            return
+
+        marked = UserStats.mark_pending_quietly(batch)
+        start = time.perf_counter()
+        written = []
+        try:
+            result = get_history_writes().insert_many(batch, ordered=False)
+            self.written += len(result.inserted_ids)
+            written = batch
+        except BulkWriteError as e:
+            # With ordered=False the rest of the batch is still attempted
+            failed_indexes = {error["index"] for error in e.details.get("writeErrors", [])}
+            written = [doc for i, doc in enumerate(batch) if i not in failed_indexes]
+            self.written += len(written)
+            self.failed += len(batch) - len(written)
+            print(f"Failed to write part of history batch: {e}")
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Failed to write history batch: {e}")
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.batches += 1
+            self.last_flush_ms = elapsed_ms
+            self.total_flush_ms += elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+        if written or marked:
+            UserStats.record_many_quietly(written, batch if marked else ())
+
+    def shutdown(self, timeout=HISTORY_SHUTDOWN_TIMEOUT):
+        # Flushes everything still queued before the process exits
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print("History writer queue full at shutdown; pending records may be lost")
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "queue_depth": self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+            "queue_capacity": self.max_queue,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "flush_latency_ms": {
+                "last": round(self.last_flush_ms, 3),
+                "max": round(self.max_flush_ms, 3),
+                "avg": round(self.total_flush_ms / self.batches, 3) if self.batches else 0.0
+            }
+        }
+
+history_writer = HistoryWriter()
+atexit.register(history_writer.shutdown)
@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeout
+import requests
+from requests.adapters import HTTPAdapter
+from config.recommenders import (
+    POOL_SIZE, POOL_BLOCK, KEEP_ALIVE, CONNECT_TIMEOUT, READ_TIMEOUT,
+    HEDGE_REQUESTS, HEDGE_PERCENTILE
+)
+from utils.resilience import get_upstream_guard, CircuitOpenError
+from utils.load_balancer import get_replica_pool
+from utils.executors import LazyExecutor
+from utils.metrics import record_upstream
+
+_hedge_executor = LazyExecutor(lambda: ThreadPoolExecutor(max_workers=POOL_SIZE * 2, thread_name_prefix="hedge"))
+
+def get_hedge_executor():
+    return _hedge_executor.get()
+
+# Pooled, keep-alive HTTP client for one recommender type; requests are
+# spread over the type's replicas by its ReplicaPool
+class UpstreamClient:
+    def __init__(self, rec_type, replicas, pool_size=POOL_SIZE, pool_block=POOL_BLOCK,
+                 keep_alive=KEEP_ALIVE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        self.rec_type = rec_type
+        self.replicas = replicas
+        self.timeout = (connect_timeout, read_timeout)
+
+        # One connection pool per replica host
+        self.adapter = HTTPAdapter(
+            pool_connections=max(len(replicas.replicas), 1),
+            pool_maxsize=pool_size,
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.headers["Connection"] = "keep-alive" if keep_alive else "close"
+
+        self.guard = get_upstream_guard(rec_type)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def post(self, json=None):
+        # Fails fast while the breaker is open, bounds the read timeout by
+        # recent latency and, if enabled, hedges requests slower than p95
+        breaker = self.guard.breaker
+        latency = self.guard.latency
+        if not breaker.allow():
+            record_upstream(self.rec_type, "circuit_open")
+            raise CircuitOpenError(f"{self.rec_type} recommender circuit is open")
+
+        timeout = (self.timeout[0], self.guard.read_timeout(self.timeout[1]))
+        hedge_after = latency.percentile(HEDGE_PERCENTILE) if HEDGE_REQUESTS else None
+
+        start = time.perf_counter()
+        try:
+            if hedge_after is not None:
+                response = self._hedged_post(json, timeout, hedge_after)
+            else:
+                response = self._send(json, timeout)
+        except Exception as e:
+            breaker.record_failure()
+            if isinstance(e, requests.exceptions.ReadTimeout):
+                latency.record_timeout(timeout[1])
+            outcome = "timeout" if isinstance(e, requests.exceptions.Timeout) else "error"
+            record_upstream(self.rec_type, outcome, time.perf_counter() - start)
+            raise
+
+        elapsed = time.perf_counter() - start
+        record_upstream(self.rec_type, response.status_code, elapsed)
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+            latency.record(elapsed)
+        return response
+
+    def _send(self, json, timeout):
+        replica = self.replicas.acquire()
+        start = time.perf_counter()
+        try:
+            response = self.session.post(replica.url, json=json, timeout=timeout)
+        except Exception:
+            self.replicas.release(replica, failed=True)
+            raise
+        self.replicas.release(replica, latency=time.perf_counter() - start, failed=response.status_code >= 500)
+        return response
+
+    def _hedged_post(self, json, timeout, hedge_after):
+        executor = get_hedge_executor()
+        primary = executor.submit(self._send, json, timeout)
+        try:
+            return primary.result(timeout=hedge_after)
+        except FuturesTimeout:
+            pass
+
+        # Primary is slower than usual: race a second request (usually to
+        # another replica) against it
+        self.hedges_sent += 1
+        hedge = executor.submit(self._send, json, timeout)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.hedges_won += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self):
+        # urllib3 counts every request sent through a pool and every new
+        # connection it had to open; the difference is connection reuse.
+        total_requests = 0
+        total_connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+
+        return {
+            "requests": total_requests,
+            "pool_hits": max(total_requests - total_connections, 0),
+            "pool_misses": total_connections,
+            "pool_maxsize": self.adapter._pool_maxsize,
+            "timeout": {"connect": self.timeout[0], "read": self.timeout[1]},
+            "hedges": {"sent": self.hedges_sent, "won": self.hedges_won},
+            "load_balancer": self.replicas.stats(),
+            **self.guard.stats()
+        }
+
+    def close(self):
+        self.session.close()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_upstream_client(rec_type):
+    client = _clients.get(rec_type)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(rec_type)
+        if client is None:
+            client = UpstreamClient(rec_type, get_replica_pool(rec_type))
+            _clients[rec_type] = client
+        return client
+
+def get_upstream_stats():
+    return {rec_type: client.stats() for rec_type, client in list(_clients.items())}
@@ -1,18 +1,16 @@
 import jwt
-import os
+from config.env import getenv
+from config.auth import TOKEN_LIFETIME
 from datetime import datetime, timedelta, timezone
-from dotenv import load_dotenv
 
-load_dotenv()
-
-SECRET_KEY = os.getenv("SECRET_KEY")
+SECRET_KEY = getenv("SECRET_KEY")
 
 def generate_jwt(user_id, username, email):
     payload = {
         "user_id": str(user_id),
         "username": username,
         "email": email,
-        "exp": datetime.now(timezone.utc) + timedelta(days=7),
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=TOKEN_LIFETIME),
         "iat": datetime.now(timezone.utc)
     }
     return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+from config.recommenders import (
+    RECOMMENDER_ENDPOINTS, LB_STRATEGY, REPLICA_EJECT_FAILURES, REPLICA_EJECT_DURATION
+)
+
+# Smoothing factor for the per-replica latency average
+EWMA_ALPHA = 0.2
+
+class Replica:
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.ewma_latency = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def score(self):
+        # Expected wait if we queue behind what is already in flight; an
+        # unmeasured replica is tried before any measured one
+        latency = self.ewma_latency if self.ewma_latency is not None else 0.0
+        return (self.outstanding + 1) * latency, self.outstanding
+
+    def stats(self, now):
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 2) if self.ewma_latency is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "ejected": self.ejected_until > now
+        }
+
+# Picks a replica per request using in-process stats only. Replicas that
+# fail `eject_failures` times in a row are ejected for `eject_duration`
+# seconds and then reinstated (passive health checking).
+class ReplicaPool:
+    def __init__(self, urls, strategy=LB_STRATEGY, eject_failures=REPLICA_EJECT_FAILURES,
+                 eject_duration=REPLICA_EJECT_DURATION):
+        if strategy not in ("p2c", "least_outstanding", "random"):
+            raise ValueError(f"Unknown load balancing strategy '{strategy}'")
+        self.replicas = [Replica(url) for url in urls]
+        self.strategy = strategy
+        self.eject_failures = eject_failures
+        self.eject_duration = eject_duration
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            healthy = [r for r in self.replicas if r.ejected_until <= now]
+            if not healthy:
+                # Everything is ejected: fail open to the replica due back first
+                healthy = [min(self.replicas, key=lambda r: r.ejected_until)]
+
+            if len(healthy) == 1 or self.strategy == "random":
+                replica = random.choice(healthy)
+            elif self.strategy == "least_outstanding":
+                replica = min(healthy, key=Replica.score)
+            else:
+                a, b = random.sample(healthy, 2)
+                replica = a if a.score() <= b.score() else b
+
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica
+
+    def release(self, replica, latency=None, failed=False):
+        with self._lock:
+            replica.outstanding -= 1
+            if failed:
+                replica.failures += 1
+                replica.consecutive_failures += 1
+                if replica.consecutive_failures >= self.eject_failures and len(self.replicas) > 1:
+                    replica.ejected_until = time.monotonic() + self.eject_duration
+                    replica.ejections += 1
+                    replica.consecutive_failures = 0
+                    print(f"Ejected recommender replica {replica.url} for {self.eject_duration}s")
+                return
+
+            replica.consecutive_failures = 0
+            if latency is not None:
+                if replica.ewma_latency is None:
+                    replica.ewma_latency = latency
+                else:
+                    replica.ewma_latency += EWMA_ALPHA * (latency - replica.ewma_latency)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "replicas": [replica.stats(now) for replica in self.replicas]
+        }
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_replica_pool(rec_type):
+    pool = _pools.get(rec_type)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(rec_type)
+            if pool is None:
+                urls = RECOMMENDER_ENDPOINTS.get(rec_type)
+                if not urls:
+                    raise ValueError(f"No recommender URL configured for type '{rec_type}'")
+                pool = ReplicaPool(urls)
+                _pools[rec_type] = pool
+    return pool
@@ -0,0 +1,267 @@
+import hmac
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from functools import wraps
+from flask import request, g, Response, jsonify
+from pymongo import monitoring
+from config.metrics import (
+    METRICS_ENABLED, MONGO_COMMAND_METRICS, METRICS_BUCKET_MIN, METRICS_BUCKET_COUNT, METRICS_TOKEN,
+    METRICS_ALLOW_LOOPBACK
+)
+from config.rate_limit import RATE_LIMIT_TRUST_PROXY
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def log_buckets(minimum=METRICS_BUCKET_MIN, count=METRICS_BUCKET_COUNT):
+    return tuple(minimum * 2 ** i for i in range(count))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else f"{int(value)}.0"
+    return str(value)
+
+# Owns one thread's shard; dropped with the thread's locals when it exits
+class _ShardOwner:
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self):
+        self.shard = {}
+
+# Each thread records into its own shard (a dict keyed by label values),
+# so recording takes no lock and loses no updates; shards are only summed
+# when /metrics is scraped. When a thread exits its shard is folded into
+# a base total, so short-lived threads do not pile up shards.
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._base = {}
+        self._shards = {}
+        self._shards_lock = threading.RLock()
+
+    def _shard(self):
+        owner = getattr(self._local, "owner", None)
+        if owner is None:
+            owner = self._local.owner = _ShardOwner()
+            with self._shards_lock:
+                self._shards[id(owner.shard)] = owner.shard
+            weakref.finalize(owner, self._retire, owner.shard)
+        return owner.shard
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            self._shards.pop(id(shard), None)
+            self._merge(self._base, shard.items())
+
+    def collect(self):
+        totals = {}
+        with self._shards_lock:
+            self._merge(totals, self._base.items())
+            shards = list(self._shards.values())
+        for shard in shards:
+            self._merge(totals, list(shard.items()))
+        return totals
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, totals, items):
+        for labels, value in items:
+            totals[labels] = totals.get(labels, 0) + value
+
+    def _render_samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.collect().items())
+        ]
+
+# Cumulative latency histogram over fixed, doubling bucket bounds; a
+# sample is counted in the first bucket whose bound is >= the value
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=None):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets or log_buckets())
+        self._le = [repr(bound) for bound in self.buckets] + ["+Inf"]
+
+    def observe(self, seconds, *labels):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # One count per bucket plus +Inf, then the sum
+            entry = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, seconds)] += 1
+        entry[-1] += seconds
+
+    def _merge(self, totals, items):
+        for labels, entry in items:
+            total = totals.get(labels)
+            if total is None:
+                totals[labels] = list(entry)
+            else:
+                for i, value in enumerate(entry):
+                    total[i] += value
+
+    def _render_samples(self):
+        lines = []
+        for labels, entry in sorted(self.collect().items()):
+            cumulative = 0
+            for le, count in zip(self._le, entry):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', le))} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(entry[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+# Stands in for every metric when METRICS_ENABLED is off
+class _NullMetric:
+    def inc(self, *labels, amount=1):
+        pass
+
+    def observe(self, seconds, *labels):
+        pass
+
+class MetricsRegistry:
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.metrics = {}
+
+    def _register(self, cls, name, help_text, labelnames, **kwargs):
+        if not self.enabled:
+            return _NullMetric()
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, help_text, labelnames, **kwargs)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=None):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+request_latency = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+)
+stage_latency = metrics.histogram(
+    "pipeline_stage_duration_seconds", "Time spent in each pipeline stage.", ("pipeline", "stage")
+)
+upstream_requests = metrics.counter(
+    "upstream_requests_total",
+    "Recommender calls by outcome: HTTP status, timeout, error or circuit_open.",
+    ("rec_type", "outcome")
+)
+upstream_latency = metrics.histogram(
+    "upstream_request_duration_seconds", "Recommender call latency, including failed calls.", ("rec_type",)
+)
+mongo_latency = metrics.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency as reported by the driver.", ("command", "collection")
+)
+mongo_failures = metrics.counter(
+    "mongo_command_failures_total", "MongoDB commands that returned an error.", ("command", "collection")
+)
+
+def record_upstream(rec_type, outcome, seconds=None):
+    upstream_requests.inc(rec_type, str(outcome))
+    if seconds is not None:
+        upstream_latency.observe(seconds, rec_type)
+
+# Times every command the driver sends. The collection is taken from the
+# started event (the command document names it) and matched to the result
+# by request id.
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self.collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self.collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self.collections.pop(event.request_id, "")
+        mongo_latency.observe(event.duration_micros / 1e6, event.command_name, collection)
+
+    def failed(self, event):
+        collection = self.collections.pop(event.request_id, "")
+        mongo_latency.observe(event.duration_micros / 1e6, event.command_name, collection)
+        mongo_failures.inc(event.command_name, collection)
+
+def mongo_event_listeners():
+    if not metrics.enabled or not MONGO_COMMAND_METRICS:
+        return []
+    return [MongoCommandMetrics()]
+
+# Request latency for every Flask route, labelled with the route pattern
+# (not the raw path) to keep the number of series bounded
+def instrument_app(app):
+    if not metrics.enabled:
+        return
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        start = g.pop("request_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            request_latency.observe(time.perf_counter() - start, request.method, route, response.status_code)
+        return response
+
+def metrics_response():
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+# Operational endpoints answer only the scraper: the bearer METRICS_TOKEN,
+# or loopback clients when explicitly allowed and no proxy is in front.
+# Closed by default.
+def internal_request_allowed(authorization, remote_addr):
+    if METRICS_TOKEN and authorization:
+        expected = f"Bearer {METRICS_TOKEN}".encode()
+        if hmac.compare_digest(authorization.encode(), expected):
+            return True
+    if METRICS_ALLOW_LOOPBACK and not RATE_LIMIT_TRUST_PROXY:
+        return remote_addr is not None and (remote_addr.startswith("127.") or remote_addr == "::1")
+    return False
+
+def internal_only(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not internal_request_allowed(request.headers.get("Authorization"), request.remote_addr):
+            return jsonify({"error": "Forbidden"}), 403
+        return f(*args, **kwargs)
+    return decorated
@@ -0,0 +1,139 @@
+import threading
+import time
+from pymongo import monitoring
+from utils.metrics import metrics
+
+checkout_wait = metrics.histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection.", ("address",)
+)
+checkout_failures = metrics.counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed, by reason.", ("address", "reason")
+)
+
+def _address(address):
+    host, port = address
+    return f"{host}:{port}"
+
+class _PoolCounters:
+    __slots__ = ("created", "closed", "in_use", "checkouts", "failures", "cleared",
+                 "waits", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.created = 0
+        self.closed = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.failures = {}
+        self.cleared = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+# Connection pool (CMAP) events per server: open and in-use connections,
+# checkouts, how long threads waited for a connection and why checkouts
+# failed (a "timeout" failure means waitQueueTimeoutMS ran out). The
+# driver publishes checkout events on the thread doing the checkout, so
+# the wait is measured with a thread-local start time. Events arrive on
+# many threads at once; the counters are updated under one short lock so
+# in_use cannot drift.
+class MongoPoolStats(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self.pools = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _pool(self, address):
+        # Caller holds the lock
+        key = _address(address)
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = _PoolCounters()
+        return pool
+
+    def _waited(self):
+        # Returns the seconds this thread waited for the checkout, once
+        start = getattr(self._local, "checkout_start", None)
+        if start is None:
+            return None
+        self._local.checkout_start = None
+        return time.perf_counter() - start
+
+    def _record_wait(self, pool, waited):
+        # Caller holds the lock
+        pool.waits += 1
+        pool.wait_total += waited
+        if waited > pool.wait_max:
+            pool.wait_max = waited
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address).cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address).created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._pool(event.address).closed += 1
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_start = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited()
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.failures[event.reason] = pool.failures.get(event.reason, 0) + 1
+            if waited is not None:
+                self._record_wait(pool, waited)
+        if waited is not None:
+            checkout_wait.observe(waited, _address(event.address))
+        checkout_failures.inc(_address(event.address), event.reason)
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.checkouts += 1
+            pool.in_use += 1
+            if waited is not None:
+                self._record_wait(pool, waited)
+        if waited is not None:
+            checkout_wait.observe(waited, _address(event.address))
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address).in_use -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                address: {
+                    "open": pool.created - pool.closed,
+                    "in_use": pool.in_use,
+                    "created": pool.created,
+                    "closed": pool.closed,
+                    "checkouts": pool.checkouts,
+                    "checkout_failures": dict(pool.failures),
+                    "cleared": pool.cleared,
+                    "avg_wait_ms": round(pool.wait_total / pool.waits * 1000, 3) if pool.waits else 0.0,
+                    "max_wait_ms": round(pool.wait_max * 1000, 3)
+                }
+                for address, pool in self.pools.items()
+            }
+
+mongo_pool_stats = MongoPoolStats()
@@ -0,0 +1,136 @@
+# Field-mapping normalizers built once per (type, options) as closures
+# over the resolved field table, so per call there is no option handling
+# left. The shared item layout gets a fixed-shape builder (one dict
+# display per item, as fast as a hand-written loop); any other field
+# table falls back to a generic loop over the table.
+#
+# A field mapping is (field, upstream keys tried in order, default): the
+# first truthy key wins as in `a or b`, and a single key falls back to the
+# default when it is missing.
+import threading
+
+# The item layout every recommender type shares (utils.recommender
+# BASE_FIELDS), raw or already normalized
+BASE_LAYOUT = ("name", "creator", "description", "genre", "rating")
+
+def _padded(sources, count):
+    # `a or b` with a missing b reads a again, which changes nothing
+    return tuple(sources) + (sources[-1],) * (count - len(sources))
+
+def _base_layout_rows(rec_type, fields, description):
+    # None unless fields are BASE_LAYOUT followed by single-key extras,
+    # with at most two name and three creator keys defaulting to None
+    if tuple(f[0] for f in fields[:5]) != BASE_LAYOUT:
+        return None
+    (_, name_keys, name_default), (_, creator_keys, creator_default) = fields[0], fields[1]
+    if len(name_keys) > 2 or len(creator_keys) > 3 or name_default is not None or creator_default is not None:
+        return None
+    if any(len(sources) != 1 for _, sources, _ in fields[2:]):
+        return None
+
+    n1, n2 = _padded(name_keys, 2)
+    c1, c2, c3 = _padded(creator_keys, 3)
+    (_, (d,), d_default), (_, (g,), g_default), (_, (r,), r_default) = fields[2:5]
+    extras = tuple((field, sources[0], default) for field, sources, default in fields[5:])
+
+    if description == "full":
+        def base_rows(items, limit=None):
+            return [{"type": rec_type, "name": item.get(n1) or item.get(n2),
+                     "creator": item.get(c1) or item.get(c2) or item.get(c3),
+                     "description": item.get(d, d_default), "genre": item.get(g, g_default),
+                     "rating": item.get(r, r_default)} for item in items]
+    elif description == "truncate":
+        def base_rows(items, limit=None):
+            return [{"type": rec_type, "name": item.get(n1) or item.get(n2),
+                     "creator": item.get(c1) or item.get(c2) or item.get(c3),
+                     "description": (item.get(d, d_default) or "")[:limit], "genre": item.get(g, g_default),
+                     "rating": item.get(r, r_default)} for item in items]
+    else:
+        def base_rows(items, limit=None):
+            return [{"type": rec_type, "name": item.get(n1) or item.get(n2),
+                     "creator": item.get(c1) or item.get(c2) or item.get(c3),
+                     "genre": item.get(g, g_default), "rating": item.get(r, r_default)} for item in items]
+
+    if not extras:
+        return base_rows
+
+    def normalize_rows(items, limit=None):
+        rows = base_rows(items, limit)
+        for field, key, default in extras:
+            for row, item in zip(rows, items):
+                row[field] = item.get(key, default)
+        return rows
+    return normalize_rows
+
+# description: "full", "truncate" (to the `limit` passed at call time) or
+# "omit". columnar=True returns {field: [values]} (no per-row "type")
+# instead of a list of dicts.
+def compile_normalizer(rec_type, fields, description="full", columnar=False):
+    normalize_rows = _base_layout_rows(rec_type, fields, description)
+    if description == "omit":
+        fields = tuple(f for f in fields if f[0] != "description")
+
+    # (field, first key, fallback keys, default, truncate)
+    plan = tuple(
+        (field, sources[0], tuple(sources[1:]), default, field == "description" and description == "truncate")
+        for field, sources, default in fields
+    )
+
+    def generic_rows(items, limit=None):
+        rows = []
+        for item in items:
+            get = item.get
+            row = {"type": rec_type}
+            for field, key, fallbacks, default, truncate in plan:
+                if fallbacks:
+                    value = get(key)
+                    if not value:
+                        for fallback in fallbacks:
+                            value = get(fallback)
+                            if value:
+                                break
+                else:
+                    value = get(key, default)
+                if truncate:
+                    value = (value or "")[:limit]
+                row[field] = value
+            rows.append(row)
+        return rows
+
+    if normalize_rows is None:
+        normalize_rows = generic_rows
+    if not columnar:
+        return normalize_rows
+
+    names = tuple(entry[0] for entry in plan)
+
+    def normalize_columns(items, limit=None):
+        rows = normalize_rows(items, limit)
+        return {field: [row[field] for row in rows] for field in names}
+    return normalize_columns
+
+# Mapping that reads back already-normalized items field by field; used to
+# reshape cached rows for the response
+def identity_fields(fields):
+    return tuple((field, (field,), default) for field, _, default in fields)
+
+# Normalizers of one type, built on first use. There are at most
+# twelve: three description modes, rows or columns, raw or normalized input.
+class NormalizerCache:
+    def __init__(self, rec_type, fields):
+        self.rec_type = rec_type
+        self.fields = fields
+        self.lock = threading.Lock()
+        self.compiled = {}
+
+    def get(self, description="full", columnar=False, normalized_input=False):
+        key = (description, columnar, normalized_input)
+        normalize = self.compiled.get(key)
+        if normalize is None:
+            with self.lock:
+                normalize = self.compiled.get(key)
+                if normalize is None:
+                    fields = identity_fields(self.fields) if normalized_input else self.fields
+                    normalize = compile_normalizer(self.rec_type, fields, description, columnar)
+                    self.compiled[key] = normalize
+        return normalize
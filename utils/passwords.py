@@ -0,0 +1,141 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+from config.auth import (
+    PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT,
+    PASSWORD_HASH_TIMEOUT, PASSWORD_HASH_RETRY_AFTER, PASSWORD_HASH_START_METHOD
+)
+from utils.executors import LazyExecutor
+
+# Raised when the hashing pool is saturated or did not answer in time;
+# the auth routes turn it into 503 with Retry-After
+class PasswordHasherBusy(Exception):
+    def __init__(self, message, retry_after=PASSWORD_HASH_RETRY_AFTER):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+def canonical_method(method):
+    # Spells out werkzeug's defaults so a stored hash's prefix can be
+    # compared with the configured method
+    name, *args = method.split(":")
+    if name == "pbkdf2":
+        hash_name = args[0] if args else "sha256"
+        iterations = args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    if name == "scrypt" and not args:
+        return "scrypt:32768:8:1"
+    return method
+
+# Run in the worker processes
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+def _verify(pwhash, password, method):
+    # Returns (matches, new_hash); new_hash is set when the stored hash
+    # used another method and should be replaced
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split("$", 1)[0] != method:
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+# Hashes and verifies passwords in a small process pool so slow KDF work
+# neither holds the GIL nor ties up request threads beyond waiting on a
+# future. At most workers + queue_limit jobs are accepted; further calls
+# fail fast with PasswordHasherBusy instead of queueing without bound.
+class PasswordHasher:
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 queue_limit=PASSWORD_HASH_QUEUE_LIMIT, timeout=PASSWORD_HASH_TIMEOUT,
+                 start_method=PASSWORD_HASH_START_METHOD):
+        self.method = canonical_method(method)
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.start_method = start_method
+
+        # Created lazily (so after the server has forked its workers), and
+        # again in a forked child
+        self._lock = threading.Lock()
+        self._pool = LazyExecutor(self._new_pool, on_create=self._forget_in_flight, lock=self._lock)
+        self.in_flight = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.rehashed = 0
+        self.total_ms = 0.0
+
+    def _new_pool(self):
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            # Workers only run this module's hashing functions
+            context.set_forkserver_preload(["utils.passwords"])
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def _forget_in_flight(self):
+        self.in_flight = 0
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _run(self, fn, *args):
+        start = time.perf_counter()
+        if self.workers <= 0:
+            result = fn(*args)
+        else:
+            pool = self._pool.get()
+            with self._lock:
+                if self.in_flight >= self.workers + self.queue_limit:
+                    self.rejected += 1
+                    raise PasswordHasherBusy("Too many authentication requests, please retry")
+                self.in_flight += 1
+
+            try:
+                future = pool.submit(fn, *args)
+            except (BrokenProcessPool, RuntimeError):
+                self._done(None)
+                self._pool.reset()
+                raise PasswordHasherBusy("Authentication temporarily unavailable")
+            future.add_done_callback(self._done)
+
+            try:
+                result = future.result(timeout=self.timeout)
+            except FuturesTimeout:
+                self.timeouts += 1
+                raise PasswordHasherBusy("Authentication timed out, please retry")
+            except BrokenProcessPool:
+                self._pool.reset()
+                raise PasswordHasherBusy("Authentication temporarily unavailable")
+
+        self.completed += 1
+        self.total_ms += (time.perf_counter() - start) * 1000
+        return result
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        matches, new_hash = self._run(_verify, pwhash, password, self.method)
+        if new_hash is not None:
+            self.rehashed += 1
+        return matches, new_hash
+
+    def stats(self):
+        return {
+            "method": self.method,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "rehashed": self.rehashed,
+            "avg_ms": round(self.total_ms / self.completed, 2) if self.completed else 0.0
+        }
+
+password_hasher = PasswordHasher()
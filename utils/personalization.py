@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config.recommenders import (
+    PERSONALIZE, PROFILE_TTL, PROFILE_MAX_USERS, AFFINITY_WEIGHT, SEEN_PENALTY,
+    SEEN_ITEMS_PER_USER, SEEN_HISTORY_ENTRIES, PROFILE_BUILD_WORKERS, PROFILE_MAX_PENDING,
+    PROFILE_RETRY_INTERVAL
+)
+from utils.cache import MemoryCache, normalize_genres
+from utils.executors import LazyExecutor
+from models.user import User
+from models.user_stats import UserStats
+from models.history import History
+
+# Explicit preferences count fully; genres from history scale with their
+# share of the user's most requested genre, up to HISTORY_WEIGHT
+PREFERENCE_WEIGHT = 1.0
+HISTORY_WEIGHT = 0.8
+# Affinity added to a genre each time the user requests it
+REQUEST_STEP = 0.05
+# Bonus for items of a type the user listed in preferences["types"]
+TYPE_BONUS = 0.1
+
+# Per-user ranking inputs: genre affinity in [0, 1] (lowercase genre ->
+# weight), preferred types and the names of recently recommended items
+class UserProfile:
+    __slots__ = ("affinity", "types", "seen", "lock")
+
+    def __init__(self, affinity, types, seen_names, max_seen=SEEN_ITEMS_PER_USER):
+        self.affinity = affinity
+        self.types = types
+        self.seen = OrderedDict()
+        self.lock = threading.Lock()
+        self.mark_seen(seen_names, max_seen)
+
+    def mark_seen(self, names, max_seen=SEEN_ITEMS_PER_USER):
+        with self.lock:
+            seen = self.seen
+            for name in names:
+                if name:
+                    seen[name] = None
+                    seen.move_to_end(name)
+            while len(seen) > max_seen:
+                seen.popitem(last=False)
+
+    def observe(self, genres_list, items):
+        # Folds a served recommendation into the profile in place
+        affinity = dict(self.affinity)
+        for genre in normalize_genres(genres_list):
+            affinity[genre] = min(affinity.get(genre, 0.0) + REQUEST_STEP, 1.0)
+        self.affinity = affinity
+        self.mark_seen([item.get("name") for item in items])
+
+def build_profile(user_id):
+    affinity = {}
+    types = frozenset()
+
+    user = User.find_by_id(user_id)
+    if user is not None:
+        preferences = user.preferences or {}
+        for genre in normalize_genres(preferences.get("genres")):
+            affinity[genre] = PREFERENCE_WEIGHT
+        types = frozenset(preferences.get("types") or [])
+
+    stats = UserStats.get(user_id)
+    if stats:
+        genre_counts = {}
+        for row in stats.get("genre_preferences", []):
+            for genre in normalize_genres([row.get("_id")]):
+                genre_counts[genre] = genre_counts.get(genre, 0) + row.get("count", 0)
+        top = max(genre_counts.values(), default=0)
+        for genre, count in genre_counts.items():
+            if top:
+                affinity[genre] = max(affinity.get(genre, 0.0), HISTORY_WEIGHT * count / top)
+
+    seen = History.get_recent_item_names(user_id, SEEN_HISTORY_ENTRIES)
+    # Oldest first, so the newest names are the last ones evicted
+    seen.reverse()
+    return UserProfile(affinity, types, seen)
+
+def _item_genres(item):
+    genre = item.get("genre")
+    if not genre:
+        return ()
+    if isinstance(genre, str):
+        return (genre,)
+    return genre
+
+# Scores every item in one pass and returns a new list, best first:
+#   upstream position prior (1 .. 0) + AFFINITY_WEIGHT * best genre affinity
+#   + TYPE_BONUS for preferred types - SEEN_PENALTY if recently recommended
+# Ties keep the upstream order.
+def rerank_items(items, profile, affinity_weight=AFFINITY_WEIGHT, seen_penalty=SEEN_PENALTY):
+    count = len(items)
+    if count < 2 or not (profile.affinity or profile.types or profile.seen):
+        return list(items)
+
+    affinity = profile.affinity
+    seen = profile.seen
+    types = profile.types
+    step = 1.0 / count
+    # Upstream genre spellings repeat across items; look each one up once
+    weights = {}
+    scores = []
+    for position, item in enumerate(items):
+        best = 0.0
+        for genre in _item_genres(item):
+            weight = weights.get(genre)
+            if weight is None:
+                weight = weights[genre] = affinity.get(str(genre).lower(), 0.0)
+            if weight > best:
+                best = weight
+        score = 1.0 - position * step + affinity_weight * best
+        if item.get("type") in types:
+            score += TYPE_BONUS
+        if item.get("name") in seen:
+            score -= seen_penalty
+        scores.append(score)
+    order = sorted(range(count), key=scores.__getitem__, reverse=True)
+    return [items[i] for i in order]
+
+# Keeps user profiles in a short-lived cache: built from preferences, user
+# stats and recent history, then updated in place with every recommendation
+# served until they expire. Requests never build a profile themselves (three
+# MongoDB reads): a miss queues the build on a small pool and that response
+# keeps the upstream order. After a failed build no new builds are queued
+# for retry_interval seconds, so an unavailable MongoDB is not hammered.
+class Personalizer:
+    def __init__(self, enabled=PERSONALIZE, ttl=PROFILE_TTL, max_users=PROFILE_MAX_USERS,
+                 max_workers=PROFILE_BUILD_WORKERS, max_pending=PROFILE_MAX_PENDING,
+                 retry_interval=PROFILE_RETRY_INTERVAL):
+        self.enabled = enabled
+        self.profiles = MemoryCache(max_entries=max_users, ttl=ttl)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_interval = retry_interval
+
+        self._lock = threading.Lock()
+        self._executor = LazyExecutor(
+            lambda: ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="profile"),
+            on_create=self._forget_builds, lock=self._lock
+        )
+        self._building = set()
+        self._retry_at = 0.0
+
+        self.reranked = 0
+        self.unranked = 0
+        self.profile_builds = 0
+        self.build_failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def _forget_builds(self):
+        # Builds queued in a parent process never run here
+        self._building = set()
+
+    def profile(self, user_id):
+        # Blocking: returns the cached profile or builds it on this thread
+        key = str(user_id)
+        profile = self.profiles.get(key)
+        if profile is None:
+            try:
+                profile = build_profile(user_id)
+            except Exception:
+                self.build_failures += 1
+                self._retry_at = time.monotonic() + self.retry_interval
+                raise
+            self.profiles.set(key, profile)
+            self.profile_builds += 1
+        return profile
+
+    def cached_profile(self, user_id):
+        # Never blocks on MongoDB: None on a miss, with the build queued
+        key = str(user_id)
+        profile = self.profiles.get(key)
+        if profile is None:
+            self._schedule_build(key)
+        return profile
+
+    def _schedule_build(self, key):
+        if time.monotonic() < self._retry_at:
+            return
+        executor = self._executor.get()
+        with self._lock:
+            if key in self._building or len(self._building) >= self.max_pending:
+                return
+            self._building.add(key)
+        try:
+            executor.submit(self._build, key)
+        except RuntimeError:
+            with self._lock:
+                self._building.discard(key)
+
+    def _build(self, key):
+        try:
+            self.profile(key)
+        except Exception as e:
+            print(f"Failed to build ranking profile for user {key}: {e}")
+        finally:
+            with self._lock:
+                self._building.discard(key)
+
+    def invalidate(self, user_id):
+        self.profiles.delete(str(user_id))
+
+    def rerank(self, user_id, genres_list, items):
+        # Returns None while the user's profile is not built yet
+        profile = self.cached_profile(user_id)
+        if profile is None:
+            self.unranked += 1
+            return None
+        start = time.perf_counter()
+        ranked = rerank_items(items, profile)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        profile.observe(genres_list, ranked)
+
+        self.reranked += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        return ranked
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "reranked": self.reranked,
+            "unranked": self.unranked,
+            "profile_builds": self.profile_builds,
+            "build_failures": self.build_failures,
+            "building": len(self._building),
+            "profiles": self.profiles.info(),
+            "avg_score_ms": round(self.total_ms / self.reranked, 3) if self.reranked else 0.0,
+            "max_score_ms": round(self.max_ms, 3)
+        }
+
+personalizer = Personalizer()
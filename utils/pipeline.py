@@ -0,0 +1,58 @@
+import threading
+import time
+from utils.metrics import stage_latency
+
+# Wall-clock time spent in each named stage: calls, total and worst case
+class StageTimings:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+    def stats(self):
+        with self.lock:
+            return {
+                stage: {
+                    "count": count,
+                    "total_ms": round(total * 1000, 3),
+                    "avg_ms": round(total / count * 1000, 3),
+                    "max_ms": round(worst * 1000, 3)
+                }
+                for stage, (count, total, worst) in self.stages.items()
+            }
+
+# Runs named stages in order over one context object. Stages read and set
+# attributes on the context and raise to abort the run; each one is timed
+# whether it returns or raises. The name labels the stage latency
+# histogram exported at /metrics.
+class Pipeline:
+    def __init__(self, stages, timings=None, name="pipeline"):
+        self.stages = list(stages)
+        self.timings = timings or StageTimings()
+        self.name = name
+
+    def run(self, context):
+        for name, stage in self.stages:
+            start = time.perf_counter()
+            try:
+                stage(context)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.timings.record(name, elapsed)
+                stage_latency.observe(elapsed, self.name, name)
+        return context
+
+    def stats(self):
+        return {
+            "stages": [name for name, _ in self.stages],
+            "timings": self.timings.stats()
+        }
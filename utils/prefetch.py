@@ -0,0 +1,158 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config.recommenders import (
+    CACHE_TTL, PREFETCH_ON_LOGIN, PREFETCH_MAX_WORKERS, PREFETCH_MAX_PENDING,
+    PREFETCH_MAX_QUERIES, PREFETCH_HISTORY_ENTRIES, PREFETCH_TOP_K
+)
+from utils.cache import MemoryCache
+from utils.executors import LazyExecutor
+from utils.personalization import personalizer
+from utils.recommender import (
+    RECOMMENDER_TYPES, get_recommender_type, fetch_recommendations
+)
+from models.history import History
+
+# Warms the response cache right after login with the queries the user is
+# most likely to send first: their latest history requests, then their
+# preferred genres for each preferred (or every) type. Work runs on a small
+# pool and at most max_pending upstream calls are queued; anything beyond
+# that is skipped rather than delaying real traffic.
+class Prefetcher:
+    def __init__(self, enabled=PREFETCH_ON_LOGIN, max_workers=PREFETCH_MAX_WORKERS,
+                 max_pending=PREFETCH_MAX_PENDING, max_queries=PREFETCH_MAX_QUERIES,
+                 history_entries=PREFETCH_HISTORY_ENTRIES, top_k=PREFETCH_TOP_K):
+        self.enabled = enabled
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_queries = max_queries
+        self.history_entries = history_entries
+        self.top_k = top_k
+
+        # Keys this worker warmed that no request has read yet
+        self.prefetched = MemoryCache(max_entries=max(max_pending * 10, 1000), ttl=CACHE_TTL)
+
+        self._lock = threading.Lock()
+        self._executor = LazyExecutor(
+            lambda: ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch"),
+            on_create=self._forget_pending, lock=self._lock
+        )
+        self.pending = 0
+
+        self.logins = 0
+        self.scheduled = 0
+        self.skipped = 0
+        self.already_cached = 0
+        self.warmed = 0
+        self.failed = 0
+        self.hits = 0
+
+    def _forget_pending(self):
+        # Calls queued in a parent process never run here
+        self.pending = 0
+
+    def _reserve(self):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.skipped += 1
+                return False
+            self.pending += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+
+    def prefetch_for_user(self, user_id, preferences):
+        # Called from login; returns immediately
+        if not self.enabled:
+            return False
+        executor = self._executor.get()
+        if not self._reserve():
+            return False
+        self.logins += 1
+        try:
+            executor.submit(self._run, str(user_id), preferences or {})
+        except RuntimeError:
+            self._release()
+            return False
+        return True
+
+    def plan_queries(self, user_id, preferences):
+        queries = []
+        for rec_type, genres, top_k in History.get_recent_queries(user_id, self.history_entries):
+            if genres and get_recommender_type(rec_type) is not None:
+                queries.append((rec_type, genres, top_k if top_k is not None else self.top_k))
+
+        genres = preferences.get("genres") or []
+        if genres:
+            types = [t for t in preferences.get("types") or [] if get_recommender_type(t) is not None]
+            if not types:
+                types = [t for t in RECOMMENDER_TYPES if get_recommender_type(t) is not None]
+            queries.extend((rec_type, genres, self.top_k) for rec_type in types)
+
+        planned = {}
+        for rec_type, genres, top_k in queries:
+            key = RECOMMENDER_TYPES[rec_type].cache_key(genres, top_k)
+            if key not in planned:
+                planned[key] = (rec_type, genres, top_k)
+        return list(planned.items())[:self.max_queries]
+
+    def _run(self, user_id, preferences):
+        try:
+            # The first request also needs the user's ranking profile
+            personalizer.profile(user_id)
+            planned = self.plan_queries(user_id, preferences)
+        except Exception as e:
+            print(f"Prefetch planning failed for user {user_id}: {e}")
+            return
+        finally:
+            self._release()
+
+        executor = self._executor.get()
+        for key, query in planned:
+            if not self._reserve():
+                break
+            self.scheduled += 1
+            executor.submit(self._fetch, key, query)
+
+    def _fetch(self, key, query):
+        try:
+            _, source = fetch_recommendations(*query)
+            if source == "upstream":
+                self.prefetched.set(key, True)
+                self.warmed += 1
+            elif source == "cache":
+                self.already_cached += 1
+            else:
+                # Upstream down: a stale or fallback answer is not cached
+                self.failed += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"Prefetch failed for {key}: {e}")
+        finally:
+            self._release()
+
+    def hit_stage(self, context):
+        # Run by the recommend pipeline's prefetch_hits stage: counts
+        # requests served from a prefetched entry
+        if not self.enabled or context.source != "cache":
+            return
+        if self.prefetched.get(context.cache_key) is not None:
+            self.prefetched.delete(context.cache_key)
+            self.hits += 1
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "logins": self.logins,
+            "pending": self.pending,
+            "scheduled": self.scheduled,
+            "skipped": self.skipped,
+            "warmed": self.warmed,
+            "already_cached": self.already_cached,
+            "failed": self.failed,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.warmed, 4) if self.warmed else 0.0
+        }
+
+prefetcher = Prefetcher()
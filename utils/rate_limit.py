@@ -0,0 +1,223 @@
+import math
+import time
+from functools import wraps
+from flask import request, jsonify
+from config.rate_limit import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_REDIS_URL, RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_TRUST_PROXY, RATE_LIMITS
+)
+from config.recommenders import REDIS_SOCKET_TIMEOUT, REDIS_CONNECT_TIMEOUT
+from utils.auth import authenticate_token, get_token_from_header, AuthError
+
+# `requests` per `period` seconds with up to `burst` back to back, keyed on
+# the caller's user_id ("user") or address ("ip")
+class RateLimitPolicy:
+    __slots__ = ("name", "requests", "period", "burst", "key", "interval")
+
+    def __init__(self, name, requests, period, burst=1, key="user"):
+        if key not in ("user", "ip"):
+            raise ValueError(f"Unknown rate limit key '{key}'")
+        self.name = name
+        self.requests = requests
+        self.period = period
+        self.burst = max(burst, 1)
+        self.key = key
+        self.interval = period / requests
+
+def parse_policies(spec):
+    # "recommend=20/1:40:user,login=10/60:5:ip"
+    policies = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, rule = entry.split("=", 1)
+        rate, *options = rule.split(":")
+        requests, period = rate.split("/")
+        burst = int(options[0]) if options else 1
+        key = options[1] if len(options) > 1 else "user"
+        policies[name.strip()] = RateLimitPolicy(name.strip(), int(requests), float(period), burst, key)
+    return policies
+
+# GCRA state is one float per key, the theoretical arrival time (TAT) of
+# the next request. A request is allowed if it is no earlier than
+# TAT + interval - burst * interval; allowing it moves TAT one interval on.
+
+# In-process state: a plain dict updated without locks. Two threads racing
+# on the same key can both pass (one update is lost), which only ever errs
+# towards allowing a request. Every update re-inserts its key, so the dict
+# is ordered by last use and past max_keys the least recently used keys are
+# dropped, a constant amount of work per request.
+class MemoryRateLimitStore:
+    backend = "memory"
+    blocking = False  # True when checks wait on the network
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self.tats = {}
+        self.evicted = 0
+
+    def check(self, key, interval, burst, now):
+        tat = self.tats.get(key, now)
+        if tat < now:
+            tat = now
+        new_tat = tat + interval
+        allow_at = new_tat - interval * burst
+        if now < allow_at:
+            return False, allow_at - now
+
+        tats = self.tats
+        tats.pop(key, None)
+        tats[key] = new_tat
+        if len(tats) > self.max_keys:
+            self._evict()
+        return True, 0.0
+
+    def _evict(self):
+        # Oldest key first; forgetting a key only ever allows a request.
+        # Another thread may resize the dict mid-call, then the next
+        # request evicts instead.
+        try:
+            while len(self.tats) > self.max_keys:
+                self.tats.pop(next(iter(self.tats)), None)
+                self.evicted += 1
+        except (RuntimeError, StopIteration):
+            pass
+
+    def size(self):
+        return len(self.tats)
+
+# Same algorithm in one Lua script, so all workers share the limits
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - interval * burst
+if now < allow_at then
+    return {0, tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0'}
+"""
+
+class RedisRateLimitStore:
+    backend = "redis"
+    blocking = True
+
+    def __init__(self, url=RATE_LIMIT_REDIS_URL, socket_timeout=REDIS_SOCKET_TIMEOUT,
+                 connect_timeout=REDIS_CONNECT_TIMEOUT):
+        import redis
+
+        # Short timeouts: a stalled Redis fails open instead of holding
+        # every request
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=socket_timeout, socket_connect_timeout=connect_timeout
+        )
+        self.script = self.client.register_script(_GCRA_SCRIPT)
+        self.errors = 0
+
+    def check(self, key, interval, burst, now):
+        try:
+            allowed, retry_after = self.script(keys=[f"ratelimit:{key}"], args=[now, interval, burst])
+        except Exception as e:
+            # Fail open: an unreachable store must not take the API down
+            self.errors += 1
+            print(f"Rate limit check failed: {e}")
+            return True, 0.0
+        return bool(int(allowed)), float(retry_after)
+
+    def size(self):
+        return None
+
+def create_store():
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitStore()
+    if RATE_LIMIT_BACKEND != "memory":
+        print(f"Unknown RATE_LIMIT_BACKEND '{RATE_LIMIT_BACKEND}', using memory")
+    return MemoryRateLimitStore()
+
+class RateLimiter:
+    def __init__(self, policies, store, enabled=RATE_LIMIT_ENABLED):
+        self.policies = policies
+        self.store = store
+        self.enabled = enabled
+        self.allowed = {}
+        self.limited = {}
+
+    def check(self, policy, identity, now=None):
+        # Returns (allowed, retry_after_seconds)
+        allowed, retry_after = self.store.check(
+            f"{policy.name}:{identity}", policy.interval, policy.burst,
+            time.time() if now is None else now
+        )
+        counts = self.allowed if allowed else self.limited
+        counts[policy.name] = counts.get(policy.name, 0) + 1
+        return allowed, retry_after
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "backend": self.store.backend,
+            "keys": self.store.size(),
+            "policies": {
+                name: {
+                    "requests": policy.requests,
+                    "period": policy.period,
+                    "burst": policy.burst,
+                    "key": policy.key,
+                    "allowed": self.allowed.get(name, 0),
+                    "limited": self.limited.get(name, 0)
+                }
+                for name, policy in self.policies.items()
+            }
+        }
+
+rate_limiter = RateLimiter(parse_policies(RATE_LIMITS), create_store())
+
+def client_ip(headers, remote_addr):
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return remote_addr or "unknown"
+
+def request_identity(policy, auth_header, headers, remote_addr):
+    if policy.key == "user" and auth_header:
+        try:
+            user_id = authenticate_token(get_token_from_header(auth_header)).get("user_id")
+            if user_id:
+                return f"user:{user_id}"
+        except AuthError:
+            pass
+    return f"ip:{client_ip(headers, remote_addr)}"
+
+def limit_request(policy_name, auth_header, headers, remote_addr):
+    # Returns None when the request may proceed, otherwise the whole
+    # seconds (rounded up) the caller should wait
+    policy = rate_limiter.policies.get(policy_name)
+    if not rate_limiter.enabled or policy is None:
+        return None
+    allowed, retry_after = rate_limiter.check(policy, request_identity(policy, auth_header, headers, remote_addr))
+    if allowed:
+        return None
+    return max(math.ceil(retry_after), 1)
+
+# Applies the named policy to a Flask view; over-limit callers get 429
+# with a Retry-After header
+def rate_limit(policy_name):
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            retry_after = limit_request(
+                policy_name, request.headers.get('Authorization'), request.headers, request.remote_addr
+            )
+            if retry_after is not None:
+                response = jsonify({"error": "Rate limit exceeded", "retry_after": retry_after})
+                response.headers["Retry-After"] = str(retry_after)
+                return response, 429
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
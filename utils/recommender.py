@@ -0,0 +1,462 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+import requests
+from config.recommenders import RECOMMENDER_ENDPOINTS, RESPONSE_KEYS, FEED_MAX_WORKERS, FEED_DEADLINES
+from utils.auth import get_user_id_from_header
+from utils.http_client import get_upstream_client
+from utils.cache import recommendation_cache, stale_results, make_cache_key
+from utils.executors import LazyExecutor
+from utils.fallback_index import fallback_index
+from utils.normalizer import NormalizerCache
+from utils.personalization import personalizer
+from utils.pipeline import Pipeline
+from utils.serializer import json_response
+from utils.singleflight import SingleFlight
+from models.history import History
+
+upstream_flight = SingleFlight()
+
+# Item fields every type returns: (field, upstream keys tried in order,
+# default when none of them is present)
+BASE_FIELDS = (
+    ("name", ("name", "title"), None),
+    ("creator", ("director", "author", "creator"), None),
+    ("description", ("description",), ""),
+    ("genre", ("genre",), []),
+    ("rating", ("rating",), None)
+)
+
+# Describes one recommender type: which endpoint serves it, where its items
+# sit in the upstream response, how they map onto our item fields and
+# whether the upstream takes top_k
+class RecommenderType:
+    def __init__(self, name, response_key, fields=BASE_FIELDS, send_top_k=True):
+        self.name = name
+        self.response_key = response_key
+        self.fields = fields
+        self.send_top_k = send_top_k
+        self.normalizers = NormalizerCache(name, fields)
+
+    @property
+    def endpoints(self):
+        return RECOMMENDER_ENDPOINTS.get(self.name) or []
+
+    def upstream_payload(self, genres_list, top_k):
+        payload = {"genres": genres_list}
+        if self.send_top_k:
+            payload["top_k"] = top_k
+        return payload
+
+    def cache_key(self, genres_list, top_k):
+        return make_cache_key(self.name, genres_list, top_k if self.send_top_k else None)
+
+    def normalize(self, raw_items):
+        return self.normalizers.get()(raw_items)
+
+    def view(self, items, description_max=None, columnar=False):
+        # Reshapes normalized (possibly cached) items for the response:
+        # description_max=0 drops descriptions, a positive value truncates
+        # them; columnar returns {field: [values]}
+        if description_max is None:
+            description = "full"
+        elif description_max == 0:
+            description = "omit"
+        else:
+            description = "truncate"
+        if description == "full" and not columnar:
+            return items
+        return self.normalizers.get(description, columnar, normalized_input=True)(items, description_max)
+
+RECOMMENDER_TYPES = {
+    "movie": RecommenderType("movie", RESPONSE_KEYS["movie"]),
+    "book": RecommenderType("book", RESPONSE_KEYS["book"]),
+    # The TV recommender takes no top_k and also returns year/image_url
+    "tv": RecommenderType(
+        "tv", RESPONSE_KEYS["tv"],
+        fields=BASE_FIELDS + (("year", ("year",), None), ("image_url", ("image_url",), None)),
+        send_top_k=False
+    )
+}
+
+# Raised for a request body the recommend endpoints cannot serve
+class RecommendRequestError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+# Raised when the recommender answers but not with a usable result
+class UpstreamError(Exception):
+    def __init__(self, payload, status_code=500):
+        super().__init__(payload.get("error"))
+        self.payload = payload
+        self.status_code = status_code
+
+def get_recommender_type(rec_type):
+    descriptor = RECOMMENDER_TYPES.get(rec_type)
+    if descriptor is None or not descriptor.endpoints:
+        return None
+    return descriptor
+
+def _is_string_list(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+# 'genre' is a comma-separated string or a list of strings
+def parse_genres(genre):
+    if isinstance(genre, str):
+        return [g.strip() for g in genre.split(",")]
+    if not _is_string_list(genre):
+        raise RecommendRequestError("'genre' must be a string or a list of strings")
+    return genre
+
+def parse_recommend_payload(data):
+    if not data:
+        raise RecommendRequestError("No data provided")
+
+    rec_type = data.get('type')
+    genre = data.get('genre')
+    top_k = data.get('top_k', 10)
+
+    if not rec_type or not genre:
+        raise RecommendRequestError("Missing 'type' or 'genre'")
+
+    if not isinstance(rec_type, str) or get_recommender_type(rec_type) is None:
+        raise RecommendRequestError("Invalid or missing recommender URL for type.")
+
+    return rec_type, parse_genres(genre), top_k
+
+# Optional response shaping: 'description_max' (0 drops descriptions, N
+# truncates them to N characters) and 'format' ("rows" or "columnar")
+def parse_response_options(data):
+    description_max = data.get('description_max')
+    response_format = data.get('format', 'rows')
+
+    if description_max is not None:
+        if isinstance(description_max, bool) or not isinstance(description_max, int) or description_max < 0:
+            raise RecommendRequestError("'description_max' must be a non-negative integer")
+
+    if response_format not in ("rows", "columnar"):
+        raise RecommendRequestError("'format' must be 'rows' or 'columnar'")
+
+    return description_max, response_format == "columnar"
+
+# Shared by the sync and async clients; result_fn decodes the JSON body.
+# Returns the raw upstream items.
+def parse_upstream_response(descriptor, status_code, text, result_fn):
+    if status_code >= 400:
+        raise UpstreamError({
+            "error": f"{descriptor.name} service error",
+            "details": text,
+            "status_code": status_code
+        })
+
+    result = result_fn()
+    if result.get("status") != "success":
+        raise UpstreamError({"error": result.get("message", "Unknown error")})
+
+    return result.get(descriptor.response_key, [])
+
+def call_recommender(descriptor, genres_list, top_k):
+    response = get_upstream_client(descriptor.name).post(
+        json=descriptor.upstream_payload(genres_list, top_k)
+    )
+    return parse_upstream_response(descriptor, response.status_code, response.text, response.json)
+
+def save_recommendation_history(user_id, rec_type, genres_list, items, query_params):
+    try:
+        history = History(
+            user_id=user_id,
+            recommendation_type=rec_type,
+            genre=genres_list,
+            items=items,
+            query_params=query_params
+        )
+        if history.save_async():
+            print(f"Queued recommendation history for user {user_id}")
+        else:
+            print(f"History queue full, dropped record for user {user_id}")
+    except Exception as e:
+        print(f"Failed to save history: {e}")
+        # Don't fail the request if history saving fails
+
+def recommendation_response(rec_type, genres_list, items, source, description_max=None, columnar=False,
+                            personalized=False):
+    response = {
+        "status": "success",
+        "recommendations": RECOMMENDER_TYPES[rec_type].view(items, description_max, columnar),
+        "count": len(items),
+        "type": rec_type,
+        "genres": genres_list,
+        "cached": source in ("cache", "stale"),
+        "stale": source == "stale",
+        "fallback": source == "fallback"
+    }
+    if columnar:
+        response["format"] = "columnar"
+    if personalized:
+        response["personalized"] = True
+    return response
+
+# State carried through the recommendation pipeline for one request
+class RecommendContext:
+    __slots__ = (
+        "data", "auth_header", "user_id", "rec_type", "descriptor", "genres_list",
+        "top_k", "description_max", "columnar", "personalize", "personalized", "cache_key",
+        "raw_items", "shared", "items", "source", "response"
+    )
+
+    def __init__(self, data=None, auth_header=None, user_id=None):
+        self.data = data
+        self.auth_header = auth_header
+        self.user_id = user_id
+        self.rec_type = None
+        self.descriptor = None
+        self.genres_list = None
+        self.top_k = None
+        self.description_max = None
+        self.columnar = False
+        self.personalize = False
+        self.personalized = False
+        self.cache_key = None
+        self.raw_items = None
+        self.shared = False
+        self.items = None
+        self.source = None
+        self.response = None
+
+    @classmethod
+    def for_query(cls, rec_type, genres_list, top_k):
+        context = cls()
+        context.rec_type = rec_type
+        context.descriptor = RECOMMENDER_TYPES[rec_type]
+        context.genres_list = genres_list
+        context.top_k = top_k
+        return context
+
+def parse_stage(context):
+    context.rec_type, context.genres_list, context.top_k = parse_recommend_payload(context.data)
+    context.description_max, context.columnar = parse_response_options(context.data)
+    context.personalize = context.data.get('personalize', True) is not False
+    context.descriptor = RECOMMENDER_TYPES[context.rec_type]
+
+def authenticate_stage(context):
+    if context.user_id is None:
+        context.user_id = get_user_id_from_header(context.auth_header)
+
+def cache_lookup_stage(context):
+    context.cache_key = context.descriptor.cache_key(context.genres_list, context.top_k)
+    cached = recommendation_cache.get(context.cache_key)
+    if cached is not None:
+        context.items = cached
+        context.source = "cache"
+
+# Result for a query the upstream could not answer: the last good result
+# for the same key ("stale"), else items from the local genre index
+# ("fallback"). Returns (None, None) if there is neither.
+def degraded_result(rec_type, cache_key, genres_list, top_k):
+    stale = stale_results.get(cache_key)
+    if stale is not None:
+        return stale, "stale"
+    items = fallback_index.query(rec_type, genres_list, top_k)
+    if items is not None:
+        return items, "fallback"
+    return None, None
+
+def upstream_stage(context):
+    # Concurrent misses for the same key share a single upstream call. If
+    # the upstream fails (or its circuit is open) a degraded result is
+    # served; with none, the error is left to the caller.
+    if context.items is not None:
+        return
+
+    descriptor = context.descriptor
+    fallback_index.start()
+    try:
+        context.raw_items, context.shared = upstream_flight.do(
+            context.cache_key,
+            lambda: call_recommender(descriptor, context.genres_list, context.top_k)
+        )
+    except (requests.exceptions.RequestException, UpstreamError):
+        items, source = degraded_result(context.rec_type, context.cache_key, context.genres_list, context.top_k)
+        if items is None:
+            raise
+        context.items = items
+        context.source = source
+        return
+    context.source = "upstream"
+
+def normalize_stage(context):
+    if context.raw_items is None:
+        return
+    context.items = context.descriptor.normalize(context.raw_items)
+    # Callers that shared another request's upstream call leave the cache
+    # to that request
+    if not context.shared:
+        recommendation_cache.set(context.cache_key, context.items)
+        stale_results.set(context.cache_key, context.items)
+
+def prefetch_hits_stage(context):
+    # utils.prefetch builds on this module, so it is imported on first use
+    from utils.prefetch import prefetcher
+    prefetcher.hit_stage(context)
+
+def rerank_stage(context):
+    # Orders the items for this user; the cached list is left as it was
+    if not context.personalize or not personalizer.enabled or not context.items:
+        return
+    try:
+        ranked = personalizer.rerank(context.user_id, context.genres_list, context.items)
+        if ranked is not None:
+            context.items = ranked
+            context.personalized = True
+    except Exception as e:
+        print(f"Failed to personalize recommendations: {e}")
+
+def persist_stage(context):
+    save_recommendation_history(
+        context.user_id, context.rec_type, context.genres_list, context.items, {"top_k": context.top_k}
+    )
+
+def respond_stage(context):
+    context.response = json_response(
+        recommendation_response(
+            context.rec_type, context.genres_list, context.items, context.source,
+            context.description_max, context.columnar, context.personalized
+        )
+    )
+
+recommend_pipeline = Pipeline([
+    ("parse", parse_stage),
+    ("authenticate", authenticate_stage),
+    ("cache_lookup", cache_lookup_stage),
+    ("prefetch_hits", prefetch_hits_stage),
+    ("upstream", upstream_stage),
+    ("normalize", normalize_stage),
+    ("rerank", rerank_stage),
+    ("persist", persist_stage),
+    ("respond", respond_stage)
+], name="recommend")
+
+FETCH_STAGES = ("cache_lookup", "upstream", "normalize")
+
+# The fetch stages on their own, for the feed and prefetch; timed under
+# their own name so they don't skew the recommend request timings
+fetch_pipeline = Pipeline(
+    [(name, stage) for name, stage in recommend_pipeline.stages if name in FETCH_STAGES],
+    name="fetch"
+)
+
+# Returns (normalized_items, source) where source is "upstream", "cache",
+# "stale" or "fallback"
+def fetch_recommendations(rec_type, genres_list, top_k):
+    context = fetch_pipeline.run(RecommendContext.for_query(rec_type, genres_list, top_k))
+    return context.items, context.source
+
+_feed_executor = LazyExecutor(lambda: ThreadPoolExecutor(max_workers=FEED_MAX_WORKERS, thread_name_prefix="feed"))
+
+def get_feed_executor():
+    return _feed_executor.get()
+
+def parse_feed_payload(data):
+    if not data:
+        raise RecommendRequestError("No data provided")
+
+    genre = data.get('genre')
+    top_k = data.get('top_k', 10)
+    types = data.get('types') or [t for t in RECOMMENDER_TYPES if get_recommender_type(t)]
+    layout = data.get('layout', 'interleave')
+    deadline_ms = data.get('deadline_ms')
+
+    if not genre:
+        raise RecommendRequestError("Missing 'genre'")
+
+    if isinstance(types, str):
+        types = [t.strip() for t in types.split(",")]
+    elif not _is_string_list(types):
+        raise RecommendRequestError("'types' must be a string or a list of strings")
+
+    genres_list = parse_genres(genre)
+    types = list(dict.fromkeys(types))
+    for rec_type in types:
+        if get_recommender_type(rec_type) is None:
+            raise RecommendRequestError(f"Invalid or missing recommender URL for type '{rec_type}'.")
+
+    if layout not in ("interleave", "group"):
+        raise RecommendRequestError("'layout' must be 'interleave' or 'group'")
+
+    if deadline_ms is not None:
+        try:
+            deadline_ms = float(deadline_ms)
+        except (TypeError, ValueError):
+            raise RecommendRequestError("'deadline_ms' must be a number")
+
+    return types, genres_list, top_k, layout, deadline_ms
+
+def _feed_error(rec_type, e):
+    if isinstance(e, UpstreamError):
+        return {"status": "error", "error": e.payload.get("error")}
+    if isinstance(e, requests.exceptions.Timeout):
+        return {"status": "error", "error": f"{rec_type} service timeout"}
+    if isinstance(e, requests.exceptions.RequestException):
+        return {"status": "error", "error": f"Failed to connect to {rec_type} service"}
+    print(f"Feed error for {rec_type}: {e}")
+    return {"status": "error", "error": "Internal server error"}
+
+def _feed_source_status(items, source):
+    return {
+        "count": len(items),
+        "cached": source in ("cache", "stale"),
+        "stale": source == "stale",
+        "fallback": source == "fallback"
+    }
+
+# Calls every requested recommender concurrently and waits for each one no
+# longer than its deadline, so the feed costs roughly the slowest upstream
+# rather than the sum. Types that fail are reported in the per-type status
+# and left out of the items; types that miss the deadline are served from
+# a stale or fallback result when there is one. Late calls still finish in
+# the background and fill the cache.
+def fetch_feed(types, genres_list, top_k, deadline_ms=None):
+    executor = get_feed_executor()
+    started = time.monotonic()
+    futures = {
+        rec_type: executor.submit(fetch_recommendations, rec_type, genres_list, top_k)
+        for rec_type in types
+    }
+
+    results = {}
+    status = {}
+    for rec_type, future in futures.items():
+        deadline = FEED_DEADLINES.get(rec_type, 3.0)
+        if deadline_ms is not None:
+            deadline = min(deadline, deadline_ms / 1000)
+        remaining = max(deadline - (time.monotonic() - started), 0)
+
+        try:
+            items, source = future.result(timeout=remaining)
+        except FuturesTimeout:
+            status[rec_type] = {"status": "deadline_exceeded", "deadline_ms": round(deadline * 1000)}
+            # Fill the slot with a stale or local-index result if there is one
+            cache_key = RECOMMENDER_TYPES[rec_type].cache_key(genres_list, top_k)
+            items, source = degraded_result(rec_type, cache_key, genres_list, top_k)
+            if items is not None:
+                results[rec_type] = items
+                status[rec_type].update(_feed_source_status(items, source))
+            continue
+        except Exception as e:
+            status[rec_type] = _feed_error(rec_type, e)
+            continue
+
+        results[rec_type] = items
+        status[rec_type] = {"status": "success", **_feed_source_status(items, source)}
+
+    return results, status
+
+def interleave_items(results, types):
+    lists = [results[t] for t in types if t in results]
+    merged = []
+    for i in range(max((len(items) for items in lists), default=0)):
+        for items in lists:
+            if i < len(items):
+                merged.append(items[i])
+    return merged
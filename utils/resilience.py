@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import deque
+import requests
+from config.recommenders import (
+    READ_TIMEOUT, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, ADAPTIVE_TIMEOUT,
+    ADAPTIVE_TIMEOUT_MULTIPLIER, MIN_READ_TIMEOUT, LATENCY_WINDOW, LATENCY_MIN_SAMPLES
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Raised instead of calling an upstream whose breaker is open. It is a
+# RequestException so existing handlers answer 503 for it.
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+# Opens after `failure_threshold` consecutive failures (errors, timeouts,
+# 5xx) and fails fast until `reset_timeout` has passed; then lets a single
+# probe through (half-open) and closes again if it succeeds. on_open is
+# called (under the breaker's lock) every time it opens.
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT,
+                 on_open=None):
+        self.name = name
+        self.on_open = on_open
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.transitions = {}
+        self.rejected = 0
+
+    def _transition(self, state):
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            print(f"Circuit for {self.name} recommender opened")
+            if self.on_open is not None:
+                self.on_open()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self._transition(OPEN)
+
+    def record_abandoned(self):
+        # The call was cancelled by our side: no verdict on the upstream,
+        # but a half-open probe must not stay marked in flight forever
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions)
+        }
+
+# Sliding window of recent latencies (seconds): successful calls, plus
+# each read timeout as a sample of its timeout value so the adaptive
+# timeout can grow when the upstream slows down. Percentiles are
+# recomputed every few samples rather than on every request.
+class LatencyTracker:
+    def __init__(self, window=LATENCY_WINDOW, min_samples=LATENCY_MIN_SAMPLES, refresh_every=10):
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self._samples = deque(maxlen=window)
+        self._since_refresh = 0
+        self._percentiles = {}
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_refresh += 1
+            if self._since_refresh >= self.refresh_every:
+                self._refresh()
+
+    def record_timeout(self, timeout):
+        # The call took at least this long
+        self.record(timeout)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._since_refresh = 0
+            self._percentiles = {}
+
+    def _refresh(self):
+        ordered = sorted(self._samples)
+        self._since_refresh = 0
+        self._percentiles = {
+            p: ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+            for p in (50, 95, 99)
+        }
+
+    def percentile(self, p):
+        # None until enough samples have been seen
+        if len(self._samples) < self.min_samples:
+            return None
+        with self._lock:
+            if p not in self._percentiles:
+                ordered = sorted(self._samples)
+                return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+            return self._percentiles[p]
+
+    def read_timeout(self, ceiling=READ_TIMEOUT):
+        # p99 times a safety multiplier, clamped to [MIN_READ_TIMEOUT, ceiling]
+        if not ADAPTIVE_TIMEOUT:
+            return ceiling
+        p99 = self.percentile(99)
+        if p99 is None:
+            return ceiling
+        return min(max(p99 * ADAPTIVE_TIMEOUT_MULTIPLIER, MIN_READ_TIMEOUT), ceiling)
+
+    def stats(self):
+        return {
+            "samples": len(self._samples),
+            "p50_ms": _ms(self.percentile(50)),
+            "p95_ms": _ms(self.percentile(95)),
+            "p99_ms": _ms(self.percentile(99)),
+            "read_timeout_s": round(self.read_timeout(), 3)
+        }
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+# Breaker and latency stats for one recommender type, shared by the sync
+# and async clients. The latency window is dropped whenever the breaker
+# opens: latencies from before an outage say little about the upstream
+# that comes back.
+class UpstreamGuard:
+    def __init__(self, rec_type):
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(rec_type, on_open=self.latency.reset)
+
+    def read_timeout(self, ceiling=READ_TIMEOUT):
+        # The half-open probe gets the full configured timeout; a probe cut
+        # off at the adaptive timeout of a since-slowed upstream would keep
+        # the breaker open for good
+        if self.breaker.state == HALF_OPEN:
+            return ceiling
+        return self.latency.read_timeout(ceiling)
+
+    def stats(self):
+        return {"breaker": self.breaker.stats(), "latency": self.latency.stats()}
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+def get_upstream_guard(rec_type):
+    guard = _guards.get(rec_type)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(rec_type)
+            if guard is None:
+                guard = UpstreamGuard(rec_type)
+                _guards[rec_type] = guard
+    return guard
+
+def get_upstream_guard_stats():
+    return {rec_type: guard.stats() for rec_type, guard in list(_guards.items())}
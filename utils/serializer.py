@@ -0,0 +1,38 @@
+import json
+from datetime import datetime, timezone
+from bson import ObjectId
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# BSON rows straight to JSON bytes: ObjectId becomes its hex string and
+# datetimes ISO 8601 (naive values are UTC, as returned by pymongo). Uses
+# orjson when it is installed and the standard library otherwise.
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(",", ":"), ensure_ascii=False)
+
+    def dumps(obj):
+        return _encoder.encode(obj).encode("utf-8")
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype="application/json")
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from collections import OrderedDict
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+# Collapses concurrent calls for the same key into a single execution.
+# Only in-flight calls are shared; once the leader finishes the key is
+# released, so nothing stale is ever served from here.
+class SingleFlight:
+    def __init__(self, max_tracked_keys=1000):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._key_stats = OrderedDict()
+        self.max_tracked_keys = max_tracked_keys
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        # Returns (result, shared) where shared is True for callers that
+        # waited on another caller's execution.
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                stats = self._track(key)
+                stats["shared"] += 1
+                stats["max_waiters"] = max(stats["max_waiters"], call.waiters)
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                stats = self._track(key)
+                stats["executions"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        return call.result, False
+
+    def _track(self, key):
+        # Caller holds the lock; per-key stats are bounded LRU-style
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = {"executions": 0, "shared": 0, "max_waiters": 0}
+            self._key_stats[key] = stats
+            if len(self._key_stats) > self.max_tracked_keys:
+                self._key_stats.popitem(last=False)
+        else:
+            self._key_stats.move_to_end(key)
+        return stats
+
+    def stats(self, top=20):
+        with self._lock:
+            in_flight = {key: call.waiters for key, call in self._calls.items()}
+            busiest = sorted(self._key_stats.items(), key=lambda kv: kv[1]["shared"], reverse=True)[:top]
+
+        return {
+            "executions": self.executions,
+            "shared": self.shared,
+            "in_flight": in_flight,
+            "keys": {key: dict(stats) for key, stats in busiest}
+        }
+
+# asyncio counterpart of SingleFlight for the ASGI app. All callers run on
+# the same event loop, so no lock is needed.
+class AsyncSingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key, coro_fn):
+        future = self._calls.get(key)
+        while future is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # Only the leader's cancellation is survivable: the next
+                # caller in line runs the call instead
+                if not future.cancelled():
+                    raise
+            future = self._calls.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.executions += 1
+        try:
+            result = await coro_fn()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled (or interrupted): release the waiters instead of
+            # leaving them on a future that is never resolved
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._calls.pop(key, None)
+
+    def stats(self):
+        return {
+            "executions": self.executions,
+            "shared": self.shared,
+            "in_flight": len(self._calls)
+        }